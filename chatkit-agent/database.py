@@ -5,86 +5,569 @@ Handles all database operations without blocking the main application
 
 from __future__ import annotations
 import asyncio
+import json
+from collections import namedtuple
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
-import aiomysql
+
+# asyncmy is a Cython-accelerated drop-in for the aiomysql API: the MySQL
+# protocol and row decoding run in compiled code instead of Python
+# bytecode, which matters for the dashboard queries that pull thousands
+# of rows. Use it when installed, fall back to aiomysql otherwise.
+try:
+    import asyncmy as aiomysql
+    from asyncmy.cursors import (
+        DictCursor as _DictCursor,
+        SSCursor as _SSCursor,
+        SSDictCursor as _SSDictCursor,
+    )
+    from asyncmy.pool import Pool as _Pool
+    aiomysql.DictCursor = _DictCursor
+    aiomysql.SSCursor = _SSCursor
+    aiomysql.SSDictCursor = _SSDictCursor
+    aiomysql.Pool = _Pool
+except ImportError:
+    import aiomysql
+
 import os
+import time
 from contextlib import asynccontextmanager
+from pymysql.constants import CLIENT
 import logging
 from decimal import Decimal
 from typing import Dict, Optional, Tuple
 
+# Redis is optional - session lookups fall back to MySQL without it
+try:
+    from redis import asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+# zstandard is optional - without it email HTML bodies are stored as
+# plain text, exactly as before
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def decompress_html(value) -> Optional[str]:
+    """Return stored email HTML as text, decompressing zstd rows
+
+    Rows written before compression existed (or without zstandard
+    installed) are plain text; the zstd frame magic distinguishes the
+    two, so no separate encoding column is needed.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        if _zstd_decompressor and bytes(value[:4]) == _ZSTD_MAGIC:
+            value = _zstd_decompressor.decompress(value)
+        return value.decode('utf-8', errors='replace')
+    return value
+
+
+def _parse_mysql_datetime(value) -> Optional[datetime]:
+    """Parse the string form MySQL JSON functions give temporal columns"""
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Lightweight row types for hot-path lookups; the plain tuple cursor plus
+# a namedtuple skips the per-row dict construction DictCursor pays
+Brand = namedtuple('Brand', [
+    'id', 'brand_key', 'brand_display_name', 'brand_email',
+    'vector_store_id', 'agent_instructions'
+])
+SessionRow = namedtuple('SessionRow', [
+    'id', 'session_id', 'user_id', 'brand_id', 'status',
+    'started_at', 'message_count', 'email_sent',
+    'last_input_tokens', 'last_output_tokens', 'last_token_usage',
+    'total_input_tokens', 'total_output_tokens', 'total_tokens'
+])
+MessageRow = namedtuple('MessageRow', [
+    'role', 'content', 'message_order', 'content_type'
+])
+
+
+def _load_db_config() -> Dict[str, Any]:
+    """Parse connection settings from the environment once at import"""
+    # Pool size is load-dependent, so take it from the environment.
+    # minsize defaults to maxsize so every connection is pre-warmed at
+    # startup (TCP + auth handshakes dominate cold acquisition) instead
+    # of being paid on-demand under load
+    maxsize = int(os.getenv("DB_POOL_MAX", "50"))
+    return {
+        'host': os.getenv("DB_HOST", "localhost"),
+        'port': int(os.getenv("DB_PORT", 3306)),
+        'user': os.getenv("DB_USER", "root"),
+        'password': os.getenv("DB_PASSWORD", ""),
+        'db': os.getenv("DB_NAME", "chatbot_system"),
+        # Optional replica endpoint for the read pool; defaults to the
+        # primary so single-host deployments need no extra config
+        'read_host': os.getenv("DB_READ_HOST") or os.getenv("DB_HOST", "localhost"),
+        'maxsize': maxsize,
+        'minsize': int(os.getenv("DB_POOL_MIN", str(maxsize))),
+        'write_maxsize': int(os.getenv("DB_WRITE_POOL_MAX", "4")),
+    }
+
+
+DB_CONFIG = _load_db_config()
+
 
 class DatabasePool:
-    """Manages async MySQL connection pool"""
-    
+    """Manages async MySQL connection pools
+
+    General traffic runs on an autocommit pool against the primary; the
+    batched write-behind flusher uses a small dedicated pool with
+    autocommit off so a flush pays one commit ACK per batch instead of
+    one per statement. When DB_READ_HOST points at a replica, a third
+    pool serves the read-only analytics/dashboard queries — only those,
+    since anything that mutates (session/user writes, upserts, the
+    admin endpoints) must always see and hit the primary.
+    """
+
     def __init__(self):
         self.pool: Optional[aiomysql.Pool] = None
-    
+        self.read_pool: Optional[aiomysql.Pool] = None
+        self.write_pool: Optional[aiomysql.Pool] = None
+
     async def create_pool(self):
-        """Create connection pool"""
+        """Create the primary, replica-read and write connection pools"""
+        kwargs = dict(
+            host=DB_CONFIG['host'],
+            port=DB_CONFIG['port'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            db=DB_CONFIG['db'],
+            charset="utf8mb4",
+            # Recycle connections hourly so server-side timeouts never
+            # hand us a dead connection
+            pool_recycle=3600,
+            echo=False,
+            # Allow several statements per execute() so hot paths can
+            # collapse multiple round-trips into one
+            client_flag=CLIENT.MULTI_STATEMENTS
+        )
         try:
             self.pool = await aiomysql.create_pool(
-                host=os.getenv("DB_HOST", "localhost"),
-                port=int(os.getenv("DB_PORT", 3306)),
-                user=os.getenv("DB_USER", "root"),
-                password=os.getenv("DB_PASSWORD", ""),
-                db=os.getenv("DB_NAME", "chatbot_system"),
-                charset="utf8mb4",
                 autocommit=True,
-                maxsize=20,
-                minsize=5
+                maxsize=DB_CONFIG['maxsize'],
+                minsize=DB_CONFIG['minsize'],
+                **kwargs
+            )
+            if DB_CONFIG['read_host'] != DB_CONFIG['host']:
+                # Replica endpoint via DB_READ_HOST: dashboard and cost
+                # scans run here so they never contend with the primary
+                self.read_pool = await aiomysql.create_pool(
+                    autocommit=True,
+                    maxsize=DB_CONFIG['maxsize'],
+                    minsize=DB_CONFIG['minsize'],
+                    **{**kwargs, 'host': DB_CONFIG['read_host']}
+                )
+            else:
+                # Single-host deployment: read traffic shares the
+                # primary pool
+                self.read_pool = self.pool
+            self.write_pool = await aiomysql.create_pool(
+                autocommit=False,
+                maxsize=DB_CONFIG['write_maxsize'],
+                minsize=DB_CONFIG['write_maxsize'],
+                **kwargs
             )
             logger.info("✅ Database pool created successfully")
         except Exception as e:
             logger.error(f"❌ Failed to create database pool: {e}")
             raise
-    
+
     async def close_pool(self):
-        """Close connection pool"""
+        """Close connection pools"""
+        if self.write_pool:
+            self.write_pool.close()
+            await self.write_pool.wait_closed()
+        if self.read_pool is not None and self.read_pool is not self.pool:
+            self.read_pool.close()
+            await self.read_pool.wait_closed()
         if self.pool:
             self.pool.close()
             await self.pool.wait_closed()
             logger.info("Database pool closed")
-    
+
     @asynccontextmanager
     async def get_connection(self):
-        """Get connection from pool"""
+        """Get connection from the primary (autocommit) pool"""
         if not self.pool:
             await self.create_pool()
-        
+
         # ✅ FIX: Use acquire() not get_connection()
         async with self.pool.acquire() as conn:
             yield conn
 
+    @asynccontextmanager
+    async def get_read_connection(self):
+        """Get connection for a read-only query (replica when configured)
+
+        Only for statements that never write and can tolerate replica
+        lag — dashboards, cost reports, exports. Everything else goes
+        through get_connection().
+        """
+        if not self.read_pool:
+            await self.create_pool()
+
+        async with self.read_pool.acquire() as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def get_write_connection(self):
+        """Get connection from the batched-write pool (autocommit off)"""
+        if not self.write_pool:
+            await self.create_pool()
+
+        async with self.write_pool.acquire() as conn:
+            yield conn
+
 
 # Global database pool instance
 db_pool = DatabasePool()
 
 
+async def prepare_once(cursor, name: str, sql: str):
+    """PREPARE a named server-side statement once per pooled connection
+
+    aiomysql only speaks the MySQL text protocol, so repeated statements
+    are re-parsed server-side on every execute. Preparing them explicitly
+    lets MySQL cache the parse/plan; the set of already-prepared names is
+    tracked on the connection object because prepared statements live and
+    die with their connection.
+    """
+    conn = cursor.connection
+    prepared = getattr(conn, '_prepared_statements', None)
+    if prepared is None:
+        prepared = set()
+        conn._prepared_statements = prepared
+    if name not in prepared:
+        await cursor.execute(f"PREPARE {name} FROM %s", (sql,))
+        prepared.add(name)
+
+
+class WriteBehind:
+    """Coalescing write-behind queue for fire-and-forget statements
+
+    Hot paths enqueue (kind, params) tuples instead of spawning a task per
+    write; a single drain loop flushes the queue every ~20ms, grouping
+    homogeneous statements and submitting each group over one pooled
+    connection. This amortizes round-trips and connection acquisition
+    across many operations instead of storming the pool under load.
+    """
+
+    FLUSH_INTERVAL = 0.02  # Seconds spent collecting a batch before flushing
+    # Bound the backlog so a slow database degrades to dropped telemetry
+    # writes instead of unbounded memory growth
+    QUEUE_MAX = 10_000
+
+    def __init__(self, pool: DatabasePool):
+        self.pool = pool
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_MAX)
+        self._task: Optional[asyncio.Task] = None
+        self._dropped = 0
+
+    def put(self, kind: str, params: tuple):
+        """Enqueue a write and make sure the drain loop is running"""
+        try:
+            self.queue.put_nowait((kind, params))
+        except asyncio.QueueFull:
+            self._dropped += 1
+            if self._dropped % 100 == 1:
+                logger.error(
+                    f"Write-behind queue full, dropping '{kind}' write "
+                    f"({self._dropped} dropped so far)"
+                )
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def run(self):
+        """Drain the queue forever, flushing small batches every ~20ms"""
+        while True:
+            batch = [await self.queue.get()]
+            loop = asyncio.get_event_loop()
+            deadline = loop.time() + self.FLUSH_INTERVAL
+            while True:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def flush_pending(self):
+        """Flush anything still queued and stop the drain loop (shutdown)"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            self._task = None
+        batch = []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, tuple]]):
+        """Group the batch by statement kind and submit each group"""
+        groups: Dict[str, List[tuple]] = {}
+        for kind, params in batch:
+            groups.setdefault(kind, []).append(params)
+        try:
+            async with self.pool.get_write_connection() as conn:
+                async with conn.cursor() as cursor:
+                    if 'message' in groups:
+                        await self._flush_messages(cursor, groups['message'])
+                    if 'tokens' in groups:
+                        await self._flush_tokens(cursor, groups['tokens'])
+                    if 'email_log' in groups:
+                        await self._flush_email_logs(cursor, groups['email_log'])
+                    if 'interaction' in groups:
+                        await self._flush_interactions(cursor, groups['interaction'])
+                # One commit ACK for the whole batch
+                await conn.commit()
+        except Exception as e:
+            logger.error(f"Error flushing write-behind batch: {e}")
+
+    # LAST_INSERT_ID(next_message_order) claims a whole block of order
+    # numbers atomically, so the INSERT needs no MAX() scan and
+    # concurrent inserts cannot collide. The counter bumps ride along on
+    # the same UPDATE.
+    CLAIM_ORDER_SQL = (
+        "UPDATE sessions SET "
+        "next_message_order = LAST_INSERT_ID(next_message_order) + %s, "
+        "message_count = message_count + %s, "
+        "user_message_count = user_message_count + %s, "
+        "assistant_message_count = assistant_message_count + %s "
+        "WHERE id = %s"
+    )
+    INSERT_MESSAGES_SQL = (
+        "INSERT INTO messages ("
+        "session_id, role, content, formatted_content, content_type, "
+        "file_name, file_size, input_tokens, output_tokens, "
+        "total_tokens, message_order"
+        ") VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+    )
+
+    async def _flush_messages(self, cursor, rows: List[tuple]):
+        """Insert the batch's messages with one multi-row INSERT
+
+        Each session claims its block of order numbers (and its
+        message-count bumps) with a single counter UPDATE, orders are
+        assigned client-side, and every row in the batch then goes out
+        through one executemany — the server parses the INSERT once and
+        updates the indexes in bulk.
+        """
+        by_session: Dict[int, List[tuple]] = {}
+        for params in rows:
+            by_session.setdefault(params[0], []).append(params)
+
+        insert_rows = []
+        for session_db_id, session_rows in by_session.items():
+            roles = [r[1] for r in session_rows]
+            await cursor.execute(self.CLAIM_ORDER_SQL, (
+                len(session_rows),
+                sum(1 for role in roles if role in ('user', 'assistant')),
+                roles.count('user'),
+                roles.count('assistant'),
+                session_db_id
+            ))
+            # LAST_INSERT_ID(expr) surfaces the pre-increment counter in
+            # the OK packet: the first order number of this block
+            first_order = cursor.lastrowid
+            for offset, params in enumerate(session_rows):
+                insert_rows.append(params + (first_order + offset,))
+
+        await cursor.executemany(self.INSERT_MESSAGES_SQL, insert_rows)
+
+    async def _flush_tokens(self, cursor, rows: List[tuple]):
+        """Apply token-usage updates, one UPDATE per session per flush
+
+        Streaming responses can enqueue several updates for the same
+        session within one interval; merge them client-side — the totals
+        accumulate, the last_* columns keep the newest values — so each
+        session row is locked and written once per flush instead of once
+        per chunk.
+        """
+        merged: Dict[str, list] = {}
+        for last_in, last_out, last_usage, d_in, d_out, d_total, session_id in rows:
+            entry = merged.get(session_id)
+            if entry is None:
+                merged[session_id] = [
+                    last_in, last_out, last_usage,
+                    d_in, d_out, d_total, session_id
+                ]
+            else:
+                entry[0], entry[1], entry[2] = last_in, last_out, last_usage
+                entry[3] += d_in
+                entry[4] += d_out
+                entry[5] += d_total
+        rows = [tuple(entry) for entry in merged.values()]
+        await cursor.executemany("""
+            UPDATE sessions SET
+                last_input_tokens = %s,
+                last_output_tokens = %s,
+                last_token_usage = %s,
+                total_input_tokens = total_input_tokens + %s,
+                total_output_tokens = total_output_tokens + %s,
+                total_tokens = total_tokens + %s,
+                last_activity = NOW()
+            WHERE session_id = %s
+        """, rows)
+
+    async def _flush_email_logs(self, cursor, rows: List[tuple]):
+        """Insert all pending email log rows in one executemany"""
+        await cursor.executemany("""
+            INSERT INTO email_logs (
+                session_id, user_id, brand_id, recipient_emails,
+                subject, html_content, status, sent_at, attempt_count
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), 1)
+        """, rows)
+
+    async def _flush_interactions(self, cursor, rows: List[tuple]):
+        """Apply user-brand interaction upserts for the batch"""
+        await cursor.executemany("""
+            INSERT INTO user_brand_interactions (
+                user_id, brand_id, total_sessions, total_messages,
+                total_emails_sent, total_input_tokens, total_output_tokens,
+                total_tokens, first_interaction, last_interaction
+            ) VALUES (%s, %s, 1, %s, %s, %s, %s, %s, NOW(), NOW())
+            ON DUPLICATE KEY UPDATE
+                total_sessions = total_sessions + 1,
+                total_messages = total_messages + VALUES(total_messages),
+                total_emails_sent = total_emails_sent + VALUES(total_emails_sent),
+                total_input_tokens = total_input_tokens + VALUES(total_input_tokens),
+                total_output_tokens = total_output_tokens + VALUES(total_output_tokens),
+                total_tokens = total_tokens + VALUES(total_tokens),
+                last_interaction = NOW()
+        """, rows)
+
+
 class DatabaseHandler:
     """Main database handler for all operations"""
-    
+
+    # Brands change rarely, so cached lookups stay valid for minutes
+    BRAND_CACHE_TTL = 300
+    # Model prices change even less often than brands
+    PRICING_CACHE_TTL = 300
+    # Warm sessions are served from Redis for up to 10 minutes
+    SESSION_CACHE_TTL = 600
+    # Activity bumps are debounced and flushed in bulk every few seconds
+    ACTIVITY_FLUSH_INTERVAL = 5.0
+    # Dashboards poll the cost summaries every few seconds with identical
+    # parameters; 30 seconds of staleness is invisible there
+    COST_CACHE_TTL = 30
+
+    # add_message_with_cost batch, assembled once at import time so the
+    # per-message work is parameter binding only. Multi-statement packets
+    # go through COM_QUERY and cannot be server-side prepared, so a
+    # constant text (server digest/plan cache friendly) is the available
+    # win; single hot statements use prepare_once, and asyncmy prepares
+    # natively when installed
+    _MSG_CLAIM_SQL = """UPDATE sessions SET next_message_order = LAST_INSERT_ID(next_message_order) + 1
+           WHERE id = %s"""
+    _MSG_INSERT_SQL = """INSERT INTO messages (
+               session_id, role, content, formatted_content,
+               content_type, file_name, file_size,
+               input_tokens, output_tokens, total_tokens,
+               input_cost, output_cost, total_cost,
+               message_order
+           ) VALUES (
+               %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, LAST_INSERT_ID()
+           )"""
+    _MSG_SESSION_UPDATE_SQL = """UPDATE sessions
+           SET message_count = message_count + 1,
+               user_message_count = user_message_count + (%s = 'user'),
+               assistant_message_count = assistant_message_count + (%s = 'assistant'),
+               last_input_tokens = IF(%s = 'user', %s, last_input_tokens),
+               last_output_tokens = IF(%s = 'assistant', %s, last_output_tokens),
+               last_token_usage = IF(%s = 'assistant', last_input_tokens + %s, last_token_usage),
+               total_input_tokens = total_input_tokens + IF(%s = 'user', %s, 0),
+               total_output_tokens = total_output_tokens + IF(%s = 'assistant', %s, 0),
+               total_tokens = total_tokens + %s,
+               input_cost = input_cost + IF(%s = 'user', %s, 0),
+               output_cost = output_cost + IF(%s = 'assistant', %s, 0),
+               total_cost = total_cost + %s,
+               model_name = IF(%s = 'assistant', %s, model_name),
+               last_activity = NOW()
+           WHERE id = %s"""
+    _MSG_BATCH_SQL = ";\n".join((_MSG_CLAIM_SQL, _MSG_INSERT_SQL))
+    _MSG_BATCH_WITH_SESSION_SQL = ";\n".join(
+        (_MSG_CLAIM_SQL, _MSG_INSERT_SQL, _MSG_SESSION_UPDATE_SQL))
+
     def __init__(self):
         self.pool = db_pool
+        self.writer = WriteBehind(self.pool)
+        # TTL caches for the near-static brand tables
+        self._brand_cache: Dict[str, Tuple[float, Optional[Brand]]] = {}
+        self._recipients_cache: Dict[int, Tuple[float, List[str]]] = {}
+        self._pricing_cache: Dict[str, Tuple[float, Optional[Dict]]] = {}
+        # Short-TTL cache for the dashboard cost summaries, plus the
+        # in-flight queries so concurrent identical polls share one
+        self._cost_cache: Dict[tuple, Tuple[float, Any]] = {}
+        self._cost_inflight: Dict[tuple, asyncio.Task] = {}
+        self._activity_buffer: set = set()
+        self._activity_task: Optional[asyncio.Task] = None
+        self._redis = None
+        self._redis_unavailable = False
+
+    def _get_redis(self):
+        """Connect to Redis once if REDIS_URL is configured
+
+        Unlike the in-process TTL caches, Redis is shared across workers,
+        so a session warmed by one worker skips the MySQL round-trip in
+        every other worker too.
+        """
+        if self._redis is None and not self._redis_unavailable:
+            url = os.getenv("REDIS_URL")
+            if not url or aioredis is None:
+                self._redis_unavailable = True
+                return None
+            self._redis = aioredis.from_url(url, decode_responses=True)
+        return self._redis
     
     # ==================== BRAND OPERATIONS ====================
     
-    async def get_brand_by_key(self, brand_key: str) -> Optional[Dict[str, Any]]:
-        """Get brand details by brand key"""
+    async def get_brand_by_key(self, brand_key: str) -> Optional[Brand]:
+        """Get brand details by brand key (TTL-cached)"""
+        entry = self._brand_cache.get(brand_key)
+        if entry and time.monotonic() - entry[0] < self.BRAND_CACHE_TTL:
+            return entry[1]
+
         async with self.pool.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
+            async with conn.cursor() as cursor:
                 await cursor.execute(
-                    "SELECT * FROM brands WHERE brand_key = %s AND is_active = TRUE",
+                    """SELECT id, brand_key, brand_display_name, brand_email,
+                              vector_store_id, agent_instructions
+                       FROM brands WHERE brand_key = %s AND is_active = TRUE""",
                     (brand_key,)
                 )
-                return await cursor.fetchone()
-    
+                row = await cursor.fetchone()
+                brand = Brand(*row) if row else None
+                self._brand_cache[brand_key] = (time.monotonic(), brand)
+                return brand
+
     async def get_brand_recipients(self, brand_id: int) -> List[str]:
-        """Get all active recipient emails for a brand"""
+        """Get all active recipient emails for a brand (TTL-cached)"""
+        entry = self._recipients_cache.get(brand_id)
+        if entry and time.monotonic() - entry[0] < self.BRAND_CACHE_TTL:
+            return entry[1]
+
         async with self.pool.get_connection() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(
@@ -92,166 +575,225 @@ class DatabaseHandler:
                     (brand_id,)
                 )
                 results = await cursor.fetchall()
-                return [row[0] for row in results]
+                recipients = [row[0] for row in results]
+                self._recipients_cache[brand_id] = (time.monotonic(), recipients)
+                return recipients
+
+    def invalidate_brand_cache(self):
+        """Drop cached brand/recipient data after a brand table write"""
+        self._brand_cache.clear()
+        self._recipients_cache.clear()
     
     # ==================== USER OPERATIONS ====================
     
     async def get_or_create_user(self, email: str, user_data: Dict[str, Any]) -> int:
         """Get existing user or create new one - Returns user_id"""
         async with self.pool.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                # Try to get existing user
-                await cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-                result = await cursor.fetchone()
-                
-                if result:
-                    # Update existing user
-                    user_id = result['id']
-                    await cursor.execute("""
-                        UPDATE users SET
-                            name = COALESCE(%s, name),
-                            phone = COALESCE(%s, phone),
-                            business_name = COALESCE(%s, business_name),
-                            website = COALESCE(%s, website),
-                            location = COALESCE(%s, location),
-                            ip_address = COALESCE(%s, ip_address),
-                            city = COALESCE(%s, city),
-                            region = COALESCE(%s, region),
-                            country = COALESCE(%s, country),
-                            last_seen = NOW(),
-                            total_conversations = total_conversations + 1
-                        WHERE id = %s
-                    """, (
-                        user_data.get('name'),
-                        user_data.get('phone'),
-                        user_data.get('business_name'),
-                        user_data.get('website'),
-                        user_data.get('location'),
-                        user_data.get('ip_address'),
-                        user_data.get('city'),
-                        user_data.get('region'),
-                        user_data.get('country'),
-                        user_id
-                    ))
-                    return user_id
-                else:
-                    # Create new user
-                    await cursor.execute("""
-                        INSERT INTO users (
-                            email, name, phone, business_name, website, location,
-                            ip_address, city, region, country, total_conversations
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1)
-                    """, (
-                        email,
-                        user_data.get('name'),
-                        user_data.get('phone'),
-                        user_data.get('business_name'),
-                        user_data.get('website'),
-                        user_data.get('location'),
-                        user_data.get('ip_address'),
-                        user_data.get('city'),
-                        user_data.get('region'),
-                        user_data.get('country')
-                    ))
-                    return cursor.lastrowid
+            async with conn.cursor() as cursor:
+                # Single race-free upsert; LAST_INSERT_ID(id) makes
+                # cursor.lastrowid return the existing id on the update path
+                await cursor.execute("""
+                    INSERT INTO users (
+                        email, name, phone, business_name, website, location,
+                        ip_address, city, region, country, total_conversations
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1)
+                    ON DUPLICATE KEY UPDATE
+                        id = LAST_INSERT_ID(id),
+                        name = COALESCE(VALUES(name), name),
+                        phone = COALESCE(VALUES(phone), phone),
+                        business_name = COALESCE(VALUES(business_name), business_name),
+                        website = COALESCE(VALUES(website), website),
+                        location = COALESCE(VALUES(location), location),
+                        ip_address = COALESCE(VALUES(ip_address), ip_address),
+                        city = COALESCE(VALUES(city), city),
+                        region = COALESCE(VALUES(region), region),
+                        country = COALESCE(VALUES(country), country),
+                        last_seen = NOW(),
+                        total_conversations = total_conversations + 1
+                """, (
+                    email,
+                    user_data.get('name'),
+                    user_data.get('phone'),
+                    user_data.get('business_name'),
+                    user_data.get('website'),
+                    user_data.get('location'),
+                    user_data.get('ip_address'),
+                    user_data.get('city'),
+                    user_data.get('region'),
+                    user_data.get('country')
+                ))
+                return cursor.lastrowid
     
     async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get user by email"""
         async with self.pool.get_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+                await cursor.execute(
+                    """SELECT id, email, name, phone, business_name, website,
+                              location, city, region, country, last_seen,
+                              total_conversations
+                       FROM users WHERE email = %s""",
+                    (email,)
+                )
                 return await cursor.fetchone()
     
     # ==================== SESSION OPERATIONS ====================
     
     async def create_session(self, session_id: str, brand_id: int, user_id: Optional[int] = None) -> int:
-        """Create new session - Returns session DB id"""
+        """Create new session - Returns session DB id
+
+        is_first_session is decided here so the analytics rollup can
+        count new users without joining users; the prior-session probe
+        rides inside the INSERT (as a materialized derived table, which
+        MySQL allows where a plain same-table subquery is rejected) so
+        creation stays one round-trip.
+        """
         async with self.pool.get_connection() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute("""
                     INSERT INTO sessions (
-                        session_id, user_id, brand_id, status, started_at, last_activity
-                    ) VALUES (%s, %s, %s, 'active', NOW(), NOW())
-                """, (session_id, user_id, brand_id))
+                        session_id, user_id, brand_id, status,
+                        started_at, last_activity, is_first_session
+                    )
+                    SELECT %s, %s, %s, 'active', NOW(), NOW(),
+                           %s IS NOT NULL AND prior.cnt = 0
+                    FROM (
+                        SELECT COUNT(*) as cnt
+                        FROM (SELECT 1 FROM sessions WHERE user_id = %s LIMIT 1) t
+                    ) prior
+                """, (session_id, user_id, brand_id, user_id, user_id))
                 return cursor.lastrowid
     
-    async def get_session_by_session_id(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get session by session_id string"""
+    async def get_session_by_session_id(self, session_id: str) -> Optional[SessionRow]:
+        """Get session by session_id string (Redis-cached when available)"""
+        redis = self._get_redis()
+        if redis:
+            try:
+                cached = await redis.get(f"sess:{session_id}")
+                if cached:
+                    fields = json.loads(cached)
+                    if fields[5]:
+                        fields[5] = datetime.fromisoformat(fields[5])
+                    return SessionRow(*fields)
+            except Exception as e:
+                logger.error(f"Redis session lookup failed: {e}")
+
         async with self.pool.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
+            async with conn.cursor() as cursor:
+                # This lookup runs once per chat turn when Redis is cold;
+                # a server-side prepared statement skips the parse/plan
+                await prepare_once(
+                    cursor, 'session_by_sid',
+                    """SELECT id, session_id, user_id, brand_id, status,
+                              started_at, message_count, email_sent,
+                              last_input_tokens, last_output_tokens, last_token_usage,
+                              total_input_tokens, total_output_tokens, total_tokens
+                       FROM sessions WHERE session_id = ?"""
+                )
                 await cursor.execute(
-                    "SELECT * FROM sessions WHERE session_id = %s",
+                    "SET @sid = %s; EXECUTE session_by_sid USING @sid",
                     (session_id,)
                 )
-                return await cursor.fetchone()
+                await cursor.nextset()
+                row = await cursor.fetchone()
+                while await cursor.nextset():
+                    pass
+                session = SessionRow(*row) if row else None
+
+        if session and redis:
+            try:
+                fields = list(session)
+                fields[5] = session.started_at.isoformat() if session.started_at else None
+                fields[7] = int(session.email_sent or 0)
+                await redis.set(
+                    f"sess:{session_id}", json.dumps(fields), ex=self.SESSION_CACHE_TTL
+                )
+            except Exception as e:
+                logger.error(f"Redis session cache write failed: {e}")
+        return session
+
+    async def _invalidate_session_cache(self, session_id: str):
+        """Drop a cached session after it ends"""
+        redis = self._get_redis()
+        if redis:
+            try:
+                await redis.delete(f"sess:{session_id}")
+            except Exception as e:
+                logger.error(f"Redis session invalidation failed: {e}")
     
-    async def update_session_activity(self, session_id: str):
+    def update_session_activity(self, session_id: str):
         """Update session last activity (non-blocking)"""
-        # Fire and forget - don't wait for result
-        asyncio.create_task(self._update_session_activity_task(session_id))
-    
-    async def _update_session_activity_task(self, session_id: str):
-        """Internal task for updating session activity"""
+        # Repeated events for a session collapse into one pending entry;
+        # a periodic task flushes the whole buffer in a single UPDATE,
+        # so N bumps per window become one statement per flush
+        self._activity_buffer.add(session_id)
+        if self._activity_task is None or self._activity_task.done():
+            self._activity_task = asyncio.create_task(self._activity_flush_loop())
+
+    async def _activity_flush_loop(self):
+        """Flush the activity buffer every few seconds"""
+        while True:
+            await asyncio.sleep(self.ACTIVITY_FLUSH_INTERVAL)
+            await self.flush_activity()
+
+    async def flush_activity(self):
+        """Write all buffered activity timestamps in one statement
+
+        last_activity only needs window granularity, so every buffered
+        session gets the same NOW() via a single IN-list UPDATE — one
+        statement per flush rather than one per session.
+        """
+        if not self._activity_buffer:
+            return
+        session_ids = list(self._activity_buffer)
+        self._activity_buffer.clear()
+        placeholders = ", ".join(["%s"] * len(session_ids))
         try:
-            async with self.pool.get_connection() as conn:
+            async with self.pool.get_write_connection() as conn:
                 async with conn.cursor() as cursor:
                     await cursor.execute(
-                        "UPDATE sessions SET last_activity = NOW() WHERE session_id = %s",
-                        (session_id,)
+                        f"UPDATE sessions SET last_activity = NOW() "
+                        f"WHERE session_id IN ({placeholders})",
+                        session_ids
                     )
+                await conn.commit()
         except Exception as e:
-            logger.error(f"Error updating session activity: {e}")
-    
-    async def update_session_tokens(
-        self, 
-        session_id: str, 
-        input_tokens: int, 
-        output_tokens: int, 
+            logger.error(f"Error flushing session activity: {e}")
+
+    def update_session_tokens(
+        self,
+        session_id: str,
+        input_tokens: int,
+        output_tokens: int,
         total_tokens: int
     ):
         """Update session token usage (non-blocking)"""
-        asyncio.create_task(
-            self._update_session_tokens_task(session_id, input_tokens, output_tokens, total_tokens)
-        )
-    
-    async def _update_session_tokens_task(
-        self, 
-        session_id: str, 
-        input_tokens: int, 
-        output_tokens: int, 
-        total_tokens: int
-    ):
-        """Internal task for updating tokens"""
+        self.writer.put('tokens', (
+            input_tokens, output_tokens, total_tokens,
+            input_tokens, output_tokens, total_tokens,
+            session_id
+        ))
+
+    async def update_session_user(self, session_db_id: int, user_id: int):
+        """Point an existing session at its user (identified mid-session)
+
+        Also settles is_first_session, since the anonymous INSERT could
+        not know the user; the session being updated still has a NULL
+        user_id, so the prior-session probe never counts it.
+        """
         try:
             async with self.pool.get_connection() as conn:
                 async with conn.cursor() as cursor:
                     await cursor.execute("""
-                        UPDATE sessions SET
-                            last_input_tokens = %s,
-                            last_output_tokens = %s,
-                            last_token_usage = %s,
-                            total_input_tokens = total_input_tokens + %s,
-                            total_output_tokens = total_output_tokens + %s,
-                            total_tokens = total_tokens + %s,
-                            last_activity = NOW()
-                        WHERE session_id = %s
-                    """, (
-                        input_tokens, output_tokens, total_tokens,
-                        input_tokens, output_tokens, total_tokens,
-                        session_id
-                    ))
-        except Exception as e:
-            logger.error(f"Error updating session tokens: {e}")
-    
-    async def _update_session_user_task(self, session_db_id: int, user_id: int):
-        """Internal task for updating session user"""
-        try:
-            async with self.pool.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(
-                        "UPDATE sessions SET user_id = %s WHERE id = %s",
-                        (user_id, session_db_id)
-                    )
+                        UPDATE sessions
+                        JOIN (
+                            SELECT COUNT(*) as cnt
+                            FROM (SELECT 1 FROM sessions WHERE user_id = %s LIMIT 1) t
+                        ) prior
+                        SET user_id = %s,
+                            is_first_session = (prior.cnt = 0)
+                        WHERE id = %s
+                    """, (user_id, user_id, session_db_id))
         except Exception as e:
             logger.error(f"Error updating session user: {e}")
     
@@ -268,10 +810,102 @@ class DatabaseHandler:
                         email_sent_at = IF(%s, NOW(), NULL)
                     WHERE session_id = %s
                 """, (email_sent, email_sent, session_id))
+        await self._invalidate_session_cache(session_id)
+
+    async def finalize_session(
+        self,
+        session_id: str,
+        user_id: Optional[int],
+        brand_id: Optional[int],
+        email_sent: bool,
+        message_count: int = 0,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        model_name: str = 'gpt-4.1-nano'
+    ):
+        """End a session and record user-brand interaction stats atomically
+
+        Sends the session UPDATE and the interaction upsert as a single
+        multi-statement transaction over one connection - one round-trip
+        instead of one per statement, with atomicity as a side benefit.
+        """
+        statements = ["START TRANSACTION"]
+        params: List[Any] = []
+
+        statements.append("""
+            UPDATE sessions SET
+                status = 'ended',
+                ended_at = NOW(),
+                duration_seconds = TIMESTAMPDIFF(SECOND, started_at, NOW()),
+                email_sent = %s,
+                email_sent_at = IF(%s, NOW(), NULL)
+            WHERE session_id = %s
+        """)
+        params += [email_sent, email_sent, session_id]
+
+        if user_id and brand_id:
+            input_cost, output_cost, total_cost = await self.calculate_token_cost(
+                input_tokens, output_tokens, model_name
+            )
+            statements.append("""
+                INSERT INTO user_brand_interactions (
+                    user_id, brand_id, total_sessions, total_messages,
+                    total_emails_sent, total_input_tokens, total_output_tokens,
+                    total_tokens, total_input_cost, total_output_cost, total_cost,
+                    last_interaction
+                ) VALUES (
+                    %s, %s, 1, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
+                )
+                ON DUPLICATE KEY UPDATE
+                    total_sessions = total_sessions + 1,
+                    total_messages = total_messages + VALUES(total_messages),
+                    total_emails_sent = total_emails_sent + VALUES(total_emails_sent),
+                    total_input_tokens = total_input_tokens + VALUES(total_input_tokens),
+                    total_output_tokens = total_output_tokens + VALUES(total_output_tokens),
+                    total_tokens = total_tokens + VALUES(total_tokens),
+                    total_input_cost = total_input_cost + VALUES(total_input_cost),
+                    total_output_cost = total_output_cost + VALUES(total_output_cost),
+                    total_cost = total_cost + VALUES(total_cost),
+                    last_interaction = NOW()
+            """)
+            params += [
+                user_id, brand_id, message_count, 1 if email_sent else 0,
+                input_tokens, output_tokens, input_tokens + output_tokens,
+                input_cost, output_cost, total_cost
+            ]
+
+            # Keep the denormalized lifetime aggregates on users current
+            # in the same transaction
+            statements.append("""
+                UPDATE users SET
+                    total_sessions = total_sessions + 1,
+                    total_input_tokens = total_input_tokens + %s,
+                    total_output_tokens = total_output_tokens + %s,
+                    total_tokens = total_tokens + %s,
+                    total_input_cost = total_input_cost + %s,
+                    total_output_cost = total_output_cost + %s,
+                    total_cost = total_cost + %s,
+                    last_session_at = NOW()
+                WHERE id = %s
+            """)
+            params += [
+                input_tokens, output_tokens, input_tokens + output_tokens,
+                input_cost, output_cost, total_cost,
+                user_id
+            ]
+
+        statements.append("COMMIT")
+
+        async with self.pool.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(";\n".join(statements), params)
+                while await cursor.nextset():
+                    pass
+        await self._invalidate_session_cache(session_id)
     
     # ==================== MESSAGE OPERATIONS ====================
     
-    async def add_message(
+    def add_message(
         self,
         session_db_id: int,
         role: str,
@@ -284,82 +918,74 @@ class DatabaseHandler:
         output_tokens: int = 0
     ):
         """Add message to session (non-blocking for user messages)"""
-        # Fire and forget for better performance
-        asyncio.create_task(
-            self._add_message_task(
-                session_db_id, role, content, formatted_content, 
-                content_type, file_name, file_size, input_tokens, output_tokens
-            )
-        )
+        # Queued and coalesced by the write-behind flusher
+        self.writer.put('message', (
+            session_db_id, role, content, formatted_content, content_type,
+            file_name, file_size, input_tokens, output_tokens,
+            input_tokens + output_tokens
+        ))
     
-    async def _add_message_task(
-        self,
-        session_db_id: int,
-        role: str,
-        content: str,
-        formatted_content: Optional[str],
-        content_type: str,
-        file_name: Optional[str],
-        file_size: Optional[int],
-        input_tokens: int,
-        output_tokens: int
-    ):
-        """Internal task for adding message"""
-        try:
-            async with self.pool.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    # Get current message count
-                    await cursor.execute(
-                        "SELECT COALESCE(MAX(message_order), 0) + 1 FROM messages WHERE session_id = %s",
-                        (session_db_id,)
-                    )
-                    message_order = (await cursor.fetchone())[0]
-                    
-                    # Insert message
-                    await cursor.execute("""
-                        INSERT INTO messages (
-                            session_id, role, content, formatted_content, content_type,
-                            file_name, file_size, input_tokens, output_tokens,
-                            total_tokens, message_order
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        session_db_id, role, content, formatted_content, content_type,
-                        file_name, file_size, input_tokens, output_tokens,
-                        input_tokens + output_tokens, message_order
-                    ))
-                    
-                    # Update session message counts
-                    if role == 'user':
-                        await cursor.execute("""
-                            UPDATE sessions SET 
-                                message_count = message_count + 1,
-                                user_message_count = user_message_count + 1
-                            WHERE id = %s
-                        """, (session_db_id,))
-                    elif role == 'assistant':
-                        await cursor.execute("""
-                            UPDATE sessions SET 
-                                message_count = message_count + 1,
-                                assistant_message_count = assistant_message_count + 1
-                            WHERE id = %s
-                        """, (session_db_id,))
-        except Exception as e:
-            logger.error(f"Error adding message: {e}")
-    
-    async def get_session_messages(self, session_db_id: int) -> List[Dict[str, Any]]:
-        """Get all messages for a session"""
+    _SESSION_WITH_MSGS_SQL = ";\n".join((
+        """SELECT id, session_id, user_id, brand_id, status,
+                  started_at, message_count, email_sent,
+                  last_input_tokens, last_output_tokens, last_token_usage,
+                  total_input_tokens, total_output_tokens, total_tokens
+           FROM sessions WHERE session_id = %s""",
+        """SELECT role, content, message_order, content_type
+           FROM messages
+           WHERE session_id = (SELECT id FROM sessions WHERE session_id = %s)
+           ORDER BY message_order ASC""",
+    ))
+
+    async def get_session_with_messages(
+        self, session_id: str
+    ) -> Tuple[Optional[SessionRow], List[MessageRow]]:
+        """Fetch a session row and its full history in one round trip
+
+        Rehydration path: both SELECTs ride a single multi-statement
+        batch, so rebuilding an evicted session pays one RTT instead of
+        a session lookup followed by a message fetch. The message query
+        resolves the numeric id with a subquery so it doesn't need the
+        first result set before it can run.
+        """
         async with self.pool.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    self._SESSION_WITH_MSGS_SQL, (session_id, session_id)
+                )
+                row = await cursor.fetchone()
+                session = SessionRow(*row) if row else None
+                await cursor.nextset()
+                messages = [MessageRow(*m) for m in await cursor.fetchall()]
+                while await cursor.nextset():
+                    pass
+        return session, messages
+
+    async def iter_session_messages(self, session_db_id: int):
+        """Stream a session's messages in order without buffering them
+
+        Uses a server-side cursor so long histories never materialize in
+        client memory; rows arrive as the consumer iterates. Yields
+        MessageRow namedtuples — no per-row dict allocation.
+        """
+        async with self.pool.get_connection() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
                 await cursor.execute("""
-                    SELECT * FROM messages 
-                    WHERE session_id = %s 
+                    SELECT role, content, message_order, content_type
+                    FROM messages
+                    WHERE session_id = %s
                     ORDER BY message_order ASC
                 """, (session_db_id,))
-                return await cursor.fetchall()
+                async for row in cursor:
+                    yield MessageRow(*row)
+
+    async def get_session_messages(self, session_db_id: int) -> List[MessageRow]:
+        """Get all messages for a session as a list"""
+        return [msg async for msg in self.iter_session_messages(session_db_id)]
     
     # ==================== EMAIL LOG OPERATIONS ====================
     
-    async def log_email_send(
+    def log_email_send(
         self,
         session_db_id: int,
         user_id: Optional[int],
@@ -370,43 +996,21 @@ class DatabaseHandler:
         status: str = "sent"
     ):
         """Log email send attempt (non-blocking)"""
-        asyncio.create_task(
-            self._log_email_send_task(
-                session_db_id, user_id, brand_id, recipient_emails,
-                subject, html_content, status
-            )
-        )
-    
-    async def _log_email_send_task(
-        self,
-        session_db_id: int,
-        user_id: Optional[int],
-        brand_id: int,
-        recipient_emails: List[str],
-        subject: str,
-        html_content: str,
-        status: str
-    ):
-        """Internal task for logging email"""
-        try:
-            async with self.pool.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        INSERT INTO email_logs (
-                            session_id, user_id, brand_id, recipient_emails,
-                            subject, html_content, status, sent_at, attempt_count
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), 1)
-                    """, (
-                        session_db_id, user_id, brand_id,
-                        ','.join(recipient_emails), subject,
-                        html_content, status
-                    ))
-        except Exception as e:
-            logger.error(f"Error logging email: {e}")
+        # Compress the (often large) HTML body client-side; 3-5x fewer
+        # bytes to the server, the binlog and disk
+        payload: Any = html_content
+        if _zstd_compressor and html_content:
+            payload = _zstd_compressor.compress(html_content.encode())
+        # recipient_emails is a JSON column, so no lossy CSV join
+        self.writer.put('email_log', (
+            session_db_id, user_id, brand_id,
+            json.dumps(recipient_emails), subject,
+            payload, status
+        ))
     
     # ==================== ANALYTICS OPERATIONS ====================
     
-    async def update_user_brand_interaction(
+    def update_user_brand_interaction(
         self,
         user_id: int,
         brand_id: int,
@@ -416,49 +1020,62 @@ class DatabaseHandler:
         output_tokens: int = 0
     ):
         """Update user-brand interaction stats (non-blocking)"""
-        asyncio.create_task(
-            self._update_user_brand_interaction_task(
-                user_id, brand_id, message_count, email_sent,
-                input_tokens, output_tokens
-            )
-        )
-    
-    async def _update_user_brand_interaction_task(
-        self,
-        user_id: int,
-        brand_id: int,
-        message_count: int,
-        email_sent: bool,
-        input_tokens: int,
-        output_tokens: int
-    ):
-        """Internal task for updating user-brand interaction"""
-        try:
-            async with self.pool.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        INSERT INTO user_brand_interactions (
-                            user_id, brand_id, total_sessions, total_messages,
-                            total_emails_sent, total_input_tokens, total_output_tokens,
-                            total_tokens, first_interaction, last_interaction
-                        ) VALUES (%s, %s, 1, %s, %s, %s, %s, %s, NOW(), NOW())
-                        ON DUPLICATE KEY UPDATE
-                            total_sessions = total_sessions + 1,
-                            total_messages = total_messages + %s,
-                            total_emails_sent = total_emails_sent + %s,
-                            total_input_tokens = total_input_tokens + %s,
-                            total_output_tokens = total_output_tokens + %s,
-                            total_tokens = total_tokens + %s,
-                            last_interaction = NOW()
-                    """, (
-                        user_id, brand_id, message_count, 1 if email_sent else 0,
-                        input_tokens, output_tokens, input_tokens + output_tokens,
-                        message_count, 1 if email_sent else 0,
-                        input_tokens, output_tokens, input_tokens + output_tokens
-                    ))
-        except Exception as e:
-            logger.error(f"Error updating user-brand interaction: {e}")
+        self.writer.put('interaction', (
+            user_id, brand_id, message_count, 1 if email_sent else 0,
+            input_tokens, output_tokens, input_tokens + output_tokens
+        ))
     
+    async def analytics_loop(self, interval: int = 3600):
+        """Periodically reconcile today's analytics for active brands
+
+        Simple counters (sessions, messages, emails, tokens) are kept
+        fresh by the incremental triggers in schema.sql; this loop exists
+        to recompute the averages and distinct-user counts that cannot be
+        maintained as deltas, and to correct any trigger drift, so an
+        hourly cadence is plenty.
+        """
+        last_date = datetime.now().date()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                today = datetime.now().date()
+                if today != last_date:
+                    # First pass after midnight: the last run of the
+                    # previous day fired up to an hour before it ended,
+                    # so re-run both rollups once for the completed day
+                    # to pick up sessions from that final window.
+                    prev = last_date.strftime("%Y-%m-%d")
+                    async with self.pool.get_connection() as conn:
+                        async with conn.cursor() as cursor:
+                            await cursor.execute(
+                                "SELECT DISTINCT brand_id FROM sessions "
+                                "WHERE started_at >= %s AND started_at < CURDATE()",
+                                (prev,)
+                            )
+                            prev_brand_ids = [row[0] for row in await cursor.fetchall()]
+                    for brand_id in prev_brand_ids:
+                        await self.update_daily_analytics_with_cost(brand_id, date=prev)
+                        await self.update_hourly_analytics(brand_id, date=prev)
+                    # Daily reconcile: finalize_session only credits the
+                    # users aggregates on an explicit /end-session, so
+                    # sessions closed by the auto_cleanup_sessions event
+                    # (status 'timeout') are picked up here instead.
+                    await self.reconcile_user_costs()
+                    last_date = today
+                async with self.pool.get_connection() as conn:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute(
+                            "SELECT DISTINCT brand_id FROM sessions WHERE started_at >= CURDATE()"
+                        )
+                        brand_ids = [row[0] for row in await cursor.fetchall()]
+                for brand_id in brand_ids:
+                    await self.update_daily_analytics_with_cost(brand_id)
+                    await self.update_hourly_analytics(brand_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in analytics loop: {e}")
+
     async def update_daily_analytics(self, brand_id: int, date: str = None):
         """Update daily analytics summary (non-blocking)"""
         if not date:
@@ -480,10 +1097,10 @@ class DatabaseHandler:
                         )
                         SELECT 
                             %s, %s,
-                            COUNT(DISTINCT s.id),
+                            COUNT(s.id),
                             SUM(s.message_count),
                             COUNT(DISTINCT s.user_id),
-                            COUNT(DISTINCT CASE WHEN u.first_seen >= %s THEN u.id END),
+                            COALESCE(SUM(s.is_first_session), 0),
                             SUM(s.email_sent),
                             AVG(s.duration_seconds),
                             AVG(s.message_count),
@@ -491,9 +1108,9 @@ class DatabaseHandler:
                             SUM(s.total_output_tokens),
                             SUM(s.total_tokens)
                         FROM sessions s
-                        LEFT JOIN users u ON s.user_id = u.id
                         WHERE s.brand_id = %s
-                        AND DATE(s.started_at) = %s
+                        AND s.started_at >= %s
+                        AND s.started_at < %s + INTERVAL 1 DAY
                         ON DUPLICATE KEY UPDATE
                             total_sessions = VALUES(total_sessions),
                             total_messages = VALUES(total_messages),
@@ -505,7 +1122,7 @@ class DatabaseHandler:
                             total_input_tokens = VALUES(total_input_tokens),
                             total_output_tokens = VALUES(total_output_tokens),
                             total_tokens = VALUES(total_tokens)
-                    """, (brand_id, date, date, brand_id, date))
+                    """, (brand_id, date, brand_id, date, date))
         except Exception as e:
             logger.error(f"Error updating daily analytics: {e}")
     
@@ -513,7 +1130,7 @@ class DatabaseHandler:
     
     async def get_dashboard_stats(self, brand_id: Optional[int] = None) -> Dict[str, Any]:
         """Get dashboard statistics"""
-        async with self.pool.get_connection() as conn:
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 where_clause = "WHERE brand_id = %s" if brand_id else ""
                 params = (brand_id,) if brand_id else ()
@@ -521,7 +1138,7 @@ class DatabaseHandler:
                 # Get overall stats
                 await cursor.execute(f"""
                     SELECT 
-                        COUNT(DISTINCT id) as total_sessions,
+                        COUNT(id) as total_sessions,
                         COUNT(DISTINCT user_id) as total_users,
                         SUM(message_count) as total_messages,
                         SUM(email_sent) as total_emails_sent,
@@ -532,17 +1149,56 @@ class DatabaseHandler:
                     FROM sessions
                     {where_clause}
                 """, params)
-                
+
                 return await cursor.fetchone()
+
+    async def get_dashboard_stats_bulk(
+        self, brand_ids: Optional[List[int]] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """Get dashboard statistics for many brands in one scan
+
+        One GROUP BY pass over sessions instead of one aggregate query
+        per brand; returns {brand_id: stats_row}.
+        """
+        where_clause = ""
+        params: tuple = ()
+        if brand_ids:
+            placeholders = ", ".join(["%s"] * len(brand_ids))
+            where_clause = f"WHERE brand_id IN ({placeholders})"
+            params = tuple(brand_ids)
+
+        async with self.pool.get_read_connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(f"""
+                    SELECT
+                        brand_id,
+                        COUNT(id) as total_sessions,
+                        COUNT(DISTINCT user_id) as total_users,
+                        SUM(message_count) as total_messages,
+                        SUM(email_sent) as total_emails_sent,
+                        AVG(duration_seconds) as avg_session_duration,
+                        SUM(total_input_tokens) as total_input_tokens,
+                        SUM(total_output_tokens) as total_output_tokens,
+                        SUM(total_tokens) as total_tokens
+                    FROM sessions
+                    {where_clause}
+                    GROUP BY brand_id
+                """, params)
+                rows = await cursor.fetchall()
+                return {row['brand_id']: row for row in rows}
             
 # ==================== COST TRACKING METHODS ====================
     
     async def get_model_pricing(self, model_name: str) -> Optional[Dict]:
-        """Get pricing information for a specific model"""
+        """Get pricing information for a specific model (TTL-cached)"""
+        entry = self._pricing_cache.get(model_name)
+        if entry and time.monotonic() - entry[0] < self.PRICING_CACHE_TTL:
+            return entry[1]
+
         async with self.pool.get_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
-                    SELECT 
+                    SELECT
                         model_name,
                         input_price_per_million,
                         cached_input_price_per_million,
@@ -551,7 +1207,19 @@ class DatabaseHandler:
                     FROM models
                     WHERE model_name = %s AND is_active = TRUE
                 """, (model_name,))
-                return await cursor.fetchone()
+                pricing = await cursor.fetchone()
+
+        if pricing:
+            # Precompute scaled-integer prices (picodollars per million
+            # tokens) once at cache-fill time, so calculate_token_cost is
+            # native int arithmetic with no per-call Decimal objects.
+            # Decimal is only used here, where exact scaling matters.
+            scale = 1_000_000_000_000
+            pricing['input_price_pico'] = int(Decimal(str(pricing['input_price_per_million'])) * scale)
+            pricing['cached_input_price_pico'] = int(Decimal(str(pricing['cached_input_price_per_million'])) * scale)
+            pricing['output_price_pico'] = int(Decimal(str(pricing['output_price_per_million'])) * scale)
+        self._pricing_cache[model_name] = (time.monotonic(), pricing)
+        return pricing
     
     async def calculate_token_cost(
         self, 
@@ -559,39 +1227,34 @@ class DatabaseHandler:
         output_tokens: int, 
         model_name: str = 'gpt-4.1-nano',
         use_cached: bool = False
-    ) -> Tuple[Decimal, Decimal, Decimal]:
+    ) -> Tuple[float, float, float]:
         """
         Calculate cost based on token usage
         Returns: (input_cost, output_cost, total_cost)
         """
         pricing = await self.get_model_pricing(model_name)
-        
+
         if not pricing:
             print(f"⚠️ Model {model_name} not found in pricing table, using default")
             # Fallback to gpt-4.1-nano if model not found
             pricing = await self.get_model_pricing('gpt-4.1-nano')
             if not pricing:
-                return (Decimal('0'), Decimal('0'), Decimal('0'))
-        
+                return (0.0, 0.0, 0.0)
+
         # Get appropriate input price (cached or regular)
-        if use_cached:
-            input_price = Decimal(str(pricing['cached_input_price_per_million']))
-        else:
-            input_price = Decimal(str(pricing['input_price_per_million']))
-        
-        output_price = Decimal(str(pricing['output_price_per_million']))
-        
-        # Calculate costs: (tokens / 1,000,000) * price_per_million
-        input_cost = (Decimal(str(input_tokens)) / Decimal('1000000')) * input_price
-        output_cost = (Decimal(str(output_tokens)) / Decimal('1000000')) * output_price
-        total_cost = input_cost + output_cost
-        
-        # Round to 6 decimal places
-        input_cost = input_cost.quantize(Decimal('0.000001'))
-        output_cost = output_cost.quantize(Decimal('0.000001'))
-        total_cost = total_cost.quantize(Decimal('0.000001'))
-        
-        return (input_cost, output_cost, total_cost)
+        input_price = pricing['cached_input_price_pico'] if use_cached else pricing['input_price_pico']
+
+        # Costs in picodollars: (tokens / 1,000,000) * price_per_million,
+        # computed with exact integer arithmetic; the float conversion at
+        # the end is the only rounding step
+        input_pico = input_tokens * input_price // 1_000_000
+        output_pico = output_tokens * pricing['output_price_pico'] // 1_000_000
+
+        return (
+            input_pico / 1e12,
+            output_pico / 1e12,
+            (input_pico + output_pico) / 1e12
+        )
     
     async def create_session_with_model(
         self,
@@ -608,7 +1271,6 @@ class DatabaseHandler:
                         started_at, last_activity
                     ) VALUES (%s, %s, 'active', %s, NOW(), NOW())
                 """, (session_id, brand_id, model_name))
-                await conn.commit()
                 return cursor.lastrowid
     
     async def update_session_tokens_with_cost(
@@ -647,17 +1309,16 @@ class DatabaseHandler:
                 """, (
                     input_tokens, output_tokens, total_tokens,
                     input_tokens, output_tokens, total_tokens,
-                    float(input_cost), float(output_cost), float(total_cost),
+                    input_cost, output_cost, total_cost,
                     model_name, session_id
                 ))
-                await conn.commit()
         
         print(f"💰 Cost updated - Input: ${input_cost:.6f}, Output: ${output_cost:.6f}, Total: ${total_cost:.6f}")
         
         return {
-            'input_cost': float(input_cost),
-            'output_cost': float(output_cost),
-            'total_cost': float(total_cost)
+            'input_cost': input_cost,
+            'output_cost': output_cost,
+            'total_cost': total_cost
         }
     
     async def add_message_with_cost(
@@ -681,56 +1342,56 @@ class DatabaseHandler:
             model_name
         )
         
-        async with self.pool.get_connection() as conn:
+        # Order claim, message INSERT and session counter/cost UPDATE are
+        # fused into one multi-statement batch (text prebuilt as class
+        # constants) so the whole operation costs a single network round
+        # trip; LAST_INSERT_ID() carries the claimed order into the
+        # INSERT on the same connection
+        params = [
+            session_id,
+            session_id, role, content, formatted_content,
+            content_type, file_name, file_size,
+            input_tokens, output_tokens, input_tokens + output_tokens,
+            input_cost, output_cost, total_cost
+        ]
+
+        # Session message counts, tokens and costs ride along in the same
+        # batch, so no separate token UPDATE is needed; the role-specific
+        # columns are gated by conditional arithmetic inside the one
+        # UPDATE text, so both roles bind the same statement
+        if role in ("user", "assistant"):
+            sql = self._MSG_BATCH_WITH_SESSION_SQL
+            params += [
+                role, role,
+                role, input_tokens,
+                role, output_tokens,
+                role, output_tokens,
+                role, input_tokens,
+                role, output_tokens,
+                input_tokens + output_tokens,
+                role, input_cost,
+                role, output_cost,
+                total_cost,
+                role, model_name,
+                session_id
+            ]
+        else:
+            sql = self._MSG_BATCH_SQL
+
+        # The write pool runs with autocommit off, so the whole batch is
+        # flushed to the binlog by the single commit below instead of one
+        # fsync per statement
+        async with self.pool.get_write_connection() as conn:
             async with conn.cursor() as cursor:
-                # Get current message count
-                await cursor.execute("""
-                    SELECT COALESCE(MAX(message_order), 0) + 1 as next_order
-                    FROM messages WHERE session_id = %s
-                """, (session_id,))
-                result = await cursor.fetchone()
-                message_order = result[0] if result else 1
-                
-                # Insert message
-                await cursor.execute("""
-                    INSERT INTO messages (
-                        session_id, role, content, formatted_content,
-                        content_type, file_name, file_size,
-                        input_tokens, output_tokens, total_tokens,
-                        input_cost, output_cost, total_cost,
-                        message_order
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    )
-                """, (
-                    session_id, role, content, formatted_content,
-                    content_type, file_name, file_size,
-                    input_tokens, output_tokens, input_tokens + output_tokens,
-                    float(input_cost), float(output_cost), float(total_cost),
-                    message_order
-                ))
-                
-                # Update session message counts
-                if role == "user":
-                    await cursor.execute("""
-                        UPDATE sessions
-                        SET message_count = message_count + 1,
-                            user_message_count = user_message_count + 1
-                        WHERE id = %s
-                    """, (session_id,))
-                elif role == "assistant":
-                    await cursor.execute("""
-                        UPDATE sessions
-                        SET message_count = message_count + 1,
-                            assistant_message_count = assistant_message_count + 1
-                        WHERE id = %s
-                    """, (session_id,))
-                
+                await cursor.execute(sql, tuple(params))
+                while await cursor.nextset():
+                    pass
                 await conn.commit()
-    
+        self.invalidate_cost_cache()
+
     async def get_session_cost_summary(self, session_id: str) -> Dict:
         """Get cost summary for a session"""
-        async with self.pool.get_connection() as conn:
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT 
@@ -750,13 +1411,48 @@ class DatabaseHandler:
                 """, (session_id,))
                 return await cursor.fetchone()
     
+    async def _cached_cost_read(self, key: tuple, loader):
+        """Serve a dashboard cost read through the short-TTL cache
+
+        Fresh entries come straight from memory; a miss starts the query
+        as a task that is also handed to any concurrent caller with the
+        same key (single flight), so N identical dashboard polls cost one
+        DB round-trip per TTL window. Errors propagate to every waiter
+        and are not cached.
+        """
+        entry = self._cost_cache.get(key)
+        if entry and time.monotonic() - entry[0] < self.COST_CACHE_TTL:
+            return entry[1]
+
+        task = self._cost_inflight.get(key)
+        if task is None:
+            async def _load_and_store():
+                result = await loader()
+                self._cost_cache[key] = (time.monotonic(), result)
+                return result
+
+            task = asyncio.ensure_future(_load_and_store())
+            self._cost_inflight[key] = task
+            task.add_done_callback(lambda _t: self._cost_inflight.pop(key, None))
+        return await task
+
+    def invalidate_cost_cache(self):
+        """Drop cached cost summaries after a cost-bearing write"""
+        self._cost_cache.clear()
+
     async def get_brand_cost_summary(self, brand_id: int, days: int = 30) -> Dict:
-        """Get cost summary for a brand over specified days"""
-        async with self.pool.get_connection() as conn:
+        """Get cost summary for a brand over specified days (short-TTL cached)"""
+        return await self._cached_cost_read(
+            ('brand_cost_summary', brand_id, days),
+            lambda: self._load_brand_cost_summary(brand_id, days)
+        )
+
+    async def _load_brand_cost_summary(self, brand_id: int, days: int) -> Dict:
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT 
-                        COUNT(DISTINCT s.id) as total_sessions,
+                        COUNT(s.id) as total_sessions,
                         COUNT(DISTINCT s.user_id) as unique_users,
                         SUM(s.total_input_tokens) as total_input_tokens,
                         SUM(s.total_output_tokens) as total_output_tokens,
@@ -775,11 +1471,11 @@ class DatabaseHandler:
     
     async def get_daily_cost_breakdown(self, brand_id: int, days: int = 30):
         """Get daily cost breakdown for a brand"""
-        async with self.pool.get_connection() as conn:
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT 
-                        DATE(s.started_at) as date,
+                        s.started_date as date,
                         s.model_name,
                         COUNT(s.id) as session_count,
                         SUM(s.total_input_tokens) as input_tokens,
@@ -791,32 +1487,76 @@ class DatabaseHandler:
                     FROM sessions s
                     WHERE s.brand_id = %s
                     AND s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    GROUP BY DATE(s.started_at), s.model_name
+                    GROUP BY s.started_date, s.model_name
                     ORDER BY date DESC, total_cost DESC
                 """, (brand_id, days))
                 return await cursor.fetchall()
     
     async def get_user_cost_summary(self, user_id: int) -> Dict:
-        """Get total cost summary for a user across all brands"""
-        async with self.pool.get_connection() as conn:
+        """Get total cost summary for a user across all brands
+
+        Reads the denormalized aggregates maintained by finalize_session
+        — a single indexed row fetch instead of summing every session
+        the user ever had.
+        """
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
-                    SELECT 
+                    SELECT
                         u.email,
                         u.name,
-                        COUNT(DISTINCT s.id) as total_sessions,
-                        COUNT(DISTINCT s.brand_id) as brands_used,
-                        SUM(s.total_input_tokens) as total_input_tokens,
-                        SUM(s.total_output_tokens) as total_output_tokens,
-                        SUM(s.total_cost) as total_cost,
-                        AVG(s.total_cost) as avg_cost_per_session,
-                        MAX(s.started_at) as last_session
+                        u.total_sessions,
+                        (SELECT COUNT(*) FROM user_brand_interactions ubi
+                         WHERE ubi.user_id = u.id) as brands_used,
+                        u.total_input_tokens,
+                        u.total_output_tokens,
+                        u.total_cost,
+                        u.total_cost / NULLIF(u.total_sessions, 0) as avg_cost_per_session,
+                        u.last_session_at as last_session
                     FROM users u
-                    LEFT JOIN sessions s ON u.id = s.user_id
                     WHERE u.id = %s
-                    GROUP BY u.id, u.email, u.name
                 """, (user_id,))
                 return await cursor.fetchone()
+
+    async def reconcile_user_costs(self, user_id: Optional[int] = None):
+        """Recompute the denormalized user aggregates from sessions
+
+        Run nightly by analytics_loop (or ad hoc after incidents):
+        credits sessions that never hit finalize_session — e.g. ones the
+        auto_cleanup_sessions event times out — and corrects any drift
+        in the incrementally maintained counters. With no argument it
+        reconciles every user.
+        """
+        user_filter = "WHERE user_id = %s" if user_id else "WHERE user_id IS NOT NULL"
+        params = (user_id,) if user_id else ()
+        async with self.pool.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(f"""
+                    UPDATE users u
+                    JOIN (
+                        SELECT
+                            user_id,
+                            COUNT(*) as sessions,
+                            COALESCE(SUM(total_input_tokens), 0) as input_tokens,
+                            COALESCE(SUM(total_output_tokens), 0) as output_tokens,
+                            COALESCE(SUM(total_tokens), 0) as tokens,
+                            COALESCE(SUM(input_cost), 0) as input_cost,
+                            COALESCE(SUM(output_cost), 0) as output_cost,
+                            COALESCE(SUM(total_cost), 0) as cost,
+                            MAX(started_at) as last_session_at
+                        FROM sessions
+                        {user_filter}
+                        GROUP BY user_id
+                    ) agg ON agg.user_id = u.id
+                    SET u.total_sessions = agg.sessions,
+                        u.total_input_tokens = agg.input_tokens,
+                        u.total_output_tokens = agg.output_tokens,
+                        u.total_tokens = agg.tokens,
+                        u.total_input_cost = agg.input_cost,
+                        u.total_output_cost = agg.output_cost,
+                        u.total_cost = agg.cost,
+                        u.last_session_at = agg.last_session_at
+                """, params)
     
     async def update_user_brand_interaction_with_cost(
         self,
@@ -849,27 +1589,29 @@ class DatabaseHandler:
                     )
                     ON DUPLICATE KEY UPDATE
                         total_sessions = total_sessions + 1,
-                        total_messages = total_messages + %s,
-                        total_emails_sent = total_emails_sent + %s,
-                        total_input_tokens = total_input_tokens + %s,
-                        total_output_tokens = total_output_tokens + %s,
-                        total_tokens = total_tokens + %s,
-                        total_input_cost = total_input_cost + %s,
-                        total_output_cost = total_output_cost + %s,
-                        total_cost = total_cost + %s,
+                        total_messages = total_messages + VALUES(total_messages),
+                        total_emails_sent = total_emails_sent + VALUES(total_emails_sent),
+                        total_input_tokens = total_input_tokens + VALUES(total_input_tokens),
+                        total_output_tokens = total_output_tokens + VALUES(total_output_tokens),
+                        total_tokens = total_tokens + VALUES(total_tokens),
+                        total_input_cost = total_input_cost + VALUES(total_input_cost),
+                        total_output_cost = total_output_cost + VALUES(total_output_cost),
+                        total_cost = total_cost + VALUES(total_cost),
                         last_interaction = NOW()
                 """, (
                     user_id, brand_id, message_count, 1 if email_sent else 0,
                     input_tokens, output_tokens, input_tokens + output_tokens,
-                    float(input_cost), float(output_cost), float(total_cost),
-                    message_count, 1 if email_sent else 0,
-                    input_tokens, output_tokens, input_tokens + output_tokens,
-                    float(input_cost), float(output_cost), float(total_cost)
+                    input_cost, output_cost, total_cost
                 ))
-                await conn.commit()
     
-    async def update_daily_analytics_with_cost(self, brand_id: int):
-        """Update daily analytics with cost tracking"""
+    async def update_daily_analytics_with_cost(self, brand_id: int, date: str = None):
+        """Update daily analytics with cost tracking
+
+        Defaults to today; pass a date to re-run the rollup for a
+        completed day (the analytics loop does this once after midnight).
+        """
+        if not date:
+            date = datetime.now().strftime("%Y-%m-%d")
         async with self.pool.get_connection() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute("""
@@ -881,15 +1623,13 @@ class DatabaseHandler:
                         total_input_cost, total_output_cost, total_cost,
                         avg_cost_per_session
                     )
-                    SELECT 
+                    SELECT
                         %s,
-                        CURDATE(),
-                        COUNT(DISTINCT s.id),
+                        %s,
+                        COUNT(s.id),
                         COALESCE(SUM(s.message_count), 0),
                         COUNT(DISTINCT s.user_id),
-                        COUNT(DISTINCT CASE 
-                            WHEN u.first_seen >= CURDATE() THEN s.user_id 
-                        END),
+                        COALESCE(SUM(s.is_first_session), 0),
                         SUM(CASE WHEN s.email_sent THEN 1 ELSE 0 END),
                         AVG(s.duration_seconds),
                         AVG(s.message_count),
@@ -901,9 +1641,9 @@ class DatabaseHandler:
                         COALESCE(SUM(s.total_cost), 0),
                         COALESCE(AVG(s.total_cost), 0)
                     FROM sessions s
-                    LEFT JOIN users u ON s.user_id = u.id
                     WHERE s.brand_id = %s
-                    AND DATE(s.started_at) = CURDATE()
+                    AND s.started_at >= %s
+                    AND s.started_at < DATE_ADD(%s, INTERVAL 1 DAY)
                     ON DUPLICATE KEY UPDATE
                         total_sessions = VALUES(total_sessions),
                         total_messages = VALUES(total_messages),
@@ -919,18 +1659,21 @@ class DatabaseHandler:
                         total_output_cost = VALUES(total_output_cost),
                         total_cost = VALUES(total_cost),
                         avg_cost_per_session = VALUES(avg_cost_per_session)
-                """, (brand_id, brand_id))
-                await conn.commit()
+                """, (brand_id, date, brand_id, date, date))
 
     # ==================== ENHANCED COST TRACKING METHODS ====================
 
     async def get_cost_overview(self, days: int = 30) -> Dict:
-        """Get comprehensive cost overview"""
-        async with self.pool.get_connection() as conn:
+        """Get comprehensive cost overview (short-TTL cached)"""
+        return await self._cached_cost_read(
+            ('cost_overview', days), lambda: self._load_cost_overview(days))
+
+    async def _load_cost_overview(self, days: int) -> Dict:
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT 
-                        COUNT(DISTINCT s.id) as total_sessions,
+                        COUNT(s.id) as total_sessions,
                         COUNT(DISTINCT s.brand_id) as brands_used,
                         COUNT(DISTINCT s.user_id) as unique_users,
                         SUM(s.total_input_tokens) as total_input_tokens,
@@ -942,17 +1685,21 @@ class DatabaseHandler:
                         AVG(s.total_cost) as avg_cost_per_session,
                         MAX(s.total_cost) as max_session_cost,
                         MIN(s.total_cost) as min_session_cost,
-                        SUM(CASE WHEN DATE(s.started_at) = CURDATE() THEN s.total_cost ELSE 0 END) as cost_today,
-                        SUM(CASE WHEN DATE(s.started_at) >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) THEN s.total_cost ELSE 0 END) as cost_last_7_days,
-                        SUM(CASE WHEN DATE(s.started_at) >= DATE_SUB(CURDATE(), INTERVAL 30 DAY) THEN s.total_cost ELSE 0 END) as cost_last_30_days
+                        SUM(CASE WHEN s.started_date = CURDATE() THEN s.total_cost ELSE 0 END) as cost_today,
+                        SUM(CASE WHEN s.started_date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) THEN s.total_cost ELSE 0 END) as cost_last_7_days,
+                        SUM(CASE WHEN s.started_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY) THEN s.total_cost ELSE 0 END) as cost_last_30_days
                     FROM sessions s
                     WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
                 """, (days,))
                 return await cursor.fetchone()
 
     async def get_cost_by_brand(self, days: int = 30):
-        """Get cost breakdown by brand"""
-        async with self.pool.get_connection() as conn:
+        """Get cost breakdown by brand (short-TTL cached)"""
+        return await self._cached_cost_read(
+            ('cost_by_brand', days), lambda: self._load_cost_by_brand(days))
+
+    async def _load_cost_by_brand(self, days: int):
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT 
@@ -960,7 +1707,7 @@ class DatabaseHandler:
                         b.brand_display_name,
                         b.brand_key,
                         b.default_model,
-                        COUNT(DISTINCT s.id) as session_count,
+                        COUNT(s.id) as session_count,
                         COUNT(DISTINCT s.user_id) as unique_users,
                         SUM(s.total_input_tokens) as total_input_tokens,
                         SUM(s.total_output_tokens) as total_output_tokens,
@@ -969,7 +1716,7 @@ class DatabaseHandler:
                         SUM(s.output_cost) as output_cost,
                         SUM(s.total_cost) as total_cost,
                         AVG(s.total_cost) as avg_cost_per_session,
-                        SUM(CASE WHEN DATE(s.started_at) = CURDATE() THEN s.total_cost ELSE 0 END) as cost_today,
+                        SUM(CASE WHEN s.started_date = CURDATE() THEN s.total_cost ELSE 0 END) as cost_today,
                         (SUM(s.total_cost) / NULLIF(COUNT(DISTINCT s.user_id), 0)) as cost_per_user
                     FROM brands b
                     LEFT JOIN sessions s ON b.id = s.brand_id 
@@ -981,8 +1728,14 @@ class DatabaseHandler:
                 return await cursor.fetchall()
 
     async def get_cost_by_model(self, brand_id: Optional[int] = None, days: int = 30):
-        """Get cost breakdown by model"""
-        async with self.pool.get_connection() as conn:
+        """Get cost breakdown by model (short-TTL cached)"""
+        return await self._cached_cost_read(
+            ('cost_by_model', brand_id, days),
+            lambda: self._load_cost_by_model(brand_id, days)
+        )
+
+    async def _load_cost_by_model(self, brand_id: Optional[int], days: int):
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 where_clause = "WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"
                 params = [days]
@@ -991,11 +1744,15 @@ class DatabaseHandler:
                     where_clause += " AND s.brand_id = %s"
                     params.append(brand_id)
                 
+                # sessions.model_name and models.model_name share the
+                # database default collation (see the collation note in
+                # schema.sql), so the join is a plain indexed equi-join;
+                # per-row COLLATE casts here would disable the index
                 await cursor.execute(f"""
-                    SELECT 
-                        COALESCE(s.model_name, 'unknown') COLLATE utf8mb4_unicode_ci as model_name,
+                    SELECT
+                        COALESCE(s.model_name, 'unknown') as model_name,
                         m.display_name,
-                        COUNT(DISTINCT s.id) as session_count,
+                        COUNT(s.id) as session_count,
                         SUM(s.total_input_tokens) as total_input_tokens,
                         SUM(s.total_output_tokens) as total_output_tokens,
                         SUM(s.total_tokens) as total_tokens,
@@ -1006,7 +1763,7 @@ class DatabaseHandler:
                         m.input_price_per_million,
                         m.output_price_per_million
                     FROM sessions s
-                    LEFT JOIN models m ON s.model_name COLLATE utf8mb4_unicode_ci = m.model_name COLLATE utf8mb4_unicode_ci
+                    LEFT JOIN models m ON s.model_name = m.model_name
                     {where_clause}
                     GROUP BY s.model_name, m.display_name, m.input_price_per_million, m.output_price_per_million
                     ORDER BY total_cost DESC
@@ -1014,20 +1771,46 @@ class DatabaseHandler:
                 return await cursor.fetchall()
 
     async def get_daily_cost_trend(self, brand_id: Optional[int] = None, days: int = 30):
-        """Get daily cost trends"""
-        async with self.pool.get_connection() as conn:
+        """Get daily cost trends
+
+        Completed days come from the analytics_summary rollup (O(days)
+        index rows); only today's partial day is aggregated live from
+        sessions. Re-scanning the whole period was O(sessions).
+        """
+        summary_filter = ""
+        sessions_filter = ""
+        summary_params: List[Any] = [days]
+        sessions_params: List[Any] = []
+        if brand_id:
+            summary_filter = "AND brand_id = %s"
+            sessions_filter = "AND s.brand_id = %s"
+            summary_params.append(brand_id)
+            sessions_params.append(brand_id)
+
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                where_clause = "WHERE s.started_at >= DATE_SUB(CURDATE(), INTERVAL %s DAY)"
-                params = [days]
-                
-                if brand_id:
-                    where_clause += " AND s.brand_id = %s"
-                    params.append(brand_id)
-                
                 await cursor.execute(f"""
-                    SELECT 
-                        DATE(s.started_at) as date,
-                        COUNT(DISTINCT s.id) as sessions,
+                    (SELECT
+                        date,
+                        SUM(total_sessions) as sessions,
+                        SUM(total_users) as users,
+                        SUM(total_messages) as messages,
+                        SUM(total_input_tokens) as input_tokens,
+                        SUM(total_output_tokens) as output_tokens,
+                        SUM(total_tokens) as total_tokens,
+                        SUM(total_input_cost) as input_cost,
+                        SUM(total_output_cost) as output_cost,
+                        SUM(total_cost) as total_cost,
+                        SUM(total_cost) / NULLIF(SUM(total_sessions), 0) as avg_cost_per_session
+                    FROM analytics_summary
+                    WHERE date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+                    AND date < CURDATE()
+                    {summary_filter}
+                    GROUP BY date)
+                    UNION ALL
+                    (SELECT
+                        CURDATE() as date,
+                        COUNT(s.id) as sessions,
                         COUNT(DISTINCT s.user_id) as users,
                         SUM(s.message_count) as messages,
                         SUM(s.total_input_tokens) as input_tokens,
@@ -1038,15 +1821,16 @@ class DatabaseHandler:
                         SUM(s.total_cost) as total_cost,
                         AVG(s.total_cost) as avg_cost_per_session
                     FROM sessions s
-                    {where_clause}
-                    GROUP BY DATE(s.started_at)
+                    WHERE s.started_at >= CURDATE()
+                    {sessions_filter}
+                    HAVING sessions > 0)
                     ORDER BY date DESC
-                """, params)
+                """, summary_params + sessions_params)
                 return await cursor.fetchall()
 
     async def get_top_cost_sessions(self, limit: int = 10, brand_id: Optional[int] = None):
         """Get sessions with highest costs"""
-        async with self.pool.get_connection() as conn:
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 where_clause = ""
                 params = []
@@ -1079,81 +1863,129 @@ class DatabaseHandler:
                 """, params)
                 return await cursor.fetchall()
 
-    async def get_user_cost_breakdown(self, user_id: int):
-        """Get detailed cost breakdown for a specific user"""
-        async with self.pool.get_connection() as conn:
+    async def _fetch_one(self, query: str, params: tuple = ()) -> Optional[Dict]:
+        """Run one SELECT on its own pooled connection"""
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                # Overall user cost stats
-                await cursor.execute("""
-                    SELECT 
-                        u.id,
-                        u.email,
-                        u.name,
-                        COUNT(DISTINCT s.id) as total_sessions,
-                        COUNT(DISTINCT s.brand_id) as brands_used,
-                        SUM(s.message_count) as total_messages,
-                        SUM(s.total_input_tokens) as total_input_tokens,
-                        SUM(s.total_output_tokens) as total_output_tokens,
-                        SUM(s.total_tokens) as total_tokens,
-                        SUM(s.input_cost) as total_input_cost,
-                        SUM(s.output_cost) as total_output_cost,
-                        SUM(s.total_cost) as total_cost,
-                        AVG(s.total_cost) as avg_cost_per_session,
-                        MAX(s.total_cost) as max_session_cost,
-                        MIN(s.total_cost) as min_session_cost,
-                        MAX(s.started_at) as last_session_date
-                    FROM users u
-                    LEFT JOIN sessions s ON u.id = s.user_id
-                    WHERE u.id = %s
-                    GROUP BY u.id, u.email, u.name
-                """, (user_id,))
-                user_summary = await cursor.fetchone()
-                
-                # Cost by brand for this user
-                await cursor.execute("""
-                    SELECT 
-                        b.brand_display_name,
-                        b.brand_key,
-                        COUNT(DISTINCT s.id) as sessions,
-                        SUM(s.message_count) as messages,
-                        SUM(s.total_tokens) as tokens,
-                        SUM(s.total_cost) as cost,
-                        AVG(s.total_cost) as avg_cost_per_session
-                    FROM sessions s
-                    JOIN brands b ON s.brand_id = b.id
-                    WHERE s.user_id = %s
-                    GROUP BY b.id, b.brand_display_name, b.brand_key
-                    ORDER BY cost DESC
-                """, (user_id,))
-                brand_breakdown = await cursor.fetchall()
-                
-                # Recent sessions with costs
-                await cursor.execute("""
-                    SELECT 
-                        s.session_id,
-                        s.started_at,
-                        s.model_name,
-                        s.message_count,
-                        s.total_tokens,
-                        s.total_cost,
-                        b.brand_display_name
-                    FROM sessions s
-                    JOIN brands b ON s.brand_id = b.id
-                    WHERE s.user_id = %s
-                    ORDER BY s.started_at DESC
-                    LIMIT 10
-                """, (user_id,))
-                recent_sessions = await cursor.fetchall()
-                
-                return {
-                    'summary': user_summary,
-                    'brand_breakdown': brand_breakdown,
-                    'recent_sessions': recent_sessions
-                }
+                await cursor.execute(query, params)
+                return await cursor.fetchone()
+
+    async def get_user_cost_breakdown(self, user_id: int):
+        """Get detailed cost breakdown for a specific user
+
+        Summary, per-brand breakdown and recent sessions come back from
+        one query: a CTE scans the user's sessions once and each shape
+        is folded into a JSON column, so the whole page costs a single
+        round-trip on one connection and all three views reflect the
+        same snapshot.
+        """
+        query = """
+            WITH user_sessions AS (
+                SELECT brand_id, session_id, started_at, model_name,
+                       message_count, total_input_tokens, total_output_tokens,
+                       total_tokens, input_cost, output_cost, total_cost
+                FROM sessions
+                WHERE user_id = %s
+            )
+            SELECT
+                (SELECT JSON_OBJECT(
+                            'id', u.id,
+                            'email', u.email,
+                            'name', u.name,
+                            'total_sessions', agg.total_sessions,
+                            'brands_used', agg.brands_used,
+                            'total_messages', agg.total_messages,
+                            'total_input_tokens', agg.total_input_tokens,
+                            'total_output_tokens', agg.total_output_tokens,
+                            'total_tokens', agg.total_tokens,
+                            'total_input_cost', agg.total_input_cost,
+                            'total_output_cost', agg.total_output_cost,
+                            'total_cost', agg.total_cost,
+                            'avg_cost_per_session', agg.avg_cost_per_session,
+                            'max_session_cost', agg.max_session_cost,
+                            'min_session_cost', agg.min_session_cost,
+                            'last_session_date', agg.last_session_date)
+                 FROM users u
+                 CROSS JOIN (
+                     SELECT COUNT(*) as total_sessions,
+                            COUNT(DISTINCT brand_id) as brands_used,
+                            SUM(message_count) as total_messages,
+                            SUM(total_input_tokens) as total_input_tokens,
+                            SUM(total_output_tokens) as total_output_tokens,
+                            SUM(total_tokens) as total_tokens,
+                            SUM(input_cost) as total_input_cost,
+                            SUM(output_cost) as total_output_cost,
+                            SUM(total_cost) as total_cost,
+                            AVG(total_cost) as avg_cost_per_session,
+                            MAX(total_cost) as max_session_cost,
+                            MIN(total_cost) as min_session_cost,
+                            MAX(started_at) as last_session_date
+                     FROM user_sessions
+                 ) agg
+                 WHERE u.id = %s) as summary,
+                (SELECT JSON_ARRAYAGG(JSON_OBJECT(
+                            'brand_display_name', t.brand_display_name,
+                            'brand_key', t.brand_key,
+                            'sessions', t.sessions,
+                            'messages', t.messages,
+                            'tokens', t.tokens,
+                            'cost', t.cost,
+                            'avg_cost_per_session', t.avg_cost_per_session))
+                 FROM (
+                     SELECT b.brand_display_name,
+                            b.brand_key,
+                            COUNT(*) as sessions,
+                            SUM(us.message_count) as messages,
+                            SUM(us.total_tokens) as tokens,
+                            SUM(us.total_cost) as cost,
+                            AVG(us.total_cost) as avg_cost_per_session
+                     FROM user_sessions us
+                     JOIN brands b ON us.brand_id = b.id
+                     GROUP BY b.id, b.brand_display_name, b.brand_key
+                 ) t) as brand_breakdown,
+                (SELECT JSON_ARRAYAGG(JSON_OBJECT(
+                            'session_id', t.session_id,
+                            'started_at', t.started_at,
+                            'model_name', t.model_name,
+                            'message_count', t.message_count,
+                            'total_tokens', t.total_tokens,
+                            'total_cost', t.total_cost,
+                            'brand_display_name', t.brand_display_name))
+                 FROM (
+                     SELECT us.session_id, us.started_at, us.model_name,
+                            us.message_count, us.total_tokens, us.total_cost,
+                            b.brand_display_name
+                     FROM user_sessions us
+                     JOIN brands b ON us.brand_id = b.id
+                     ORDER BY us.started_at DESC
+                     LIMIT 10
+                 ) t) as recent_sessions
+        """
+        row = await self._fetch_one(query, (user_id, user_id))
+
+        summary = json.loads(row['summary']) if row and row['summary'] else None
+        brand_breakdown = json.loads(row['brand_breakdown']) if row and row['brand_breakdown'] else []
+        recent_sessions = json.loads(row['recent_sessions']) if row and row['recent_sessions'] else []
+
+        # JSON functions serialize temporal columns as strings and
+        # JSON_ARRAYAGG does not guarantee element order, so rehydrate
+        # the datetimes the templates format and re-sort in Python
+        if summary:
+            summary['last_session_date'] = _parse_mysql_datetime(summary['last_session_date'])
+        for session in recent_sessions:
+            session['started_at'] = _parse_mysql_datetime(session['started_at'])
+        brand_breakdown.sort(key=lambda r: r['cost'] or 0, reverse=True)
+        recent_sessions.sort(key=lambda r: r['started_at'] or datetime.min, reverse=True)
+
+        return {
+            'summary': summary,
+            'brand_breakdown': brand_breakdown,
+            'recent_sessions': recent_sessions
+        }
 
     async def get_cost_efficiency_metrics(self, brand_id: Optional[int] = None, days: int = 30):
         """Get cost efficiency metrics"""
-        async with self.pool.get_connection() as conn:
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 where_clause = "WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"
                 params = [days]
@@ -1164,7 +1996,7 @@ class DatabaseHandler:
                 
                 await cursor.execute(f"""
                     SELECT 
-                        (SUM(s.total_cost) / NULLIF(COUNT(DISTINCT s.id), 0)) as cost_per_session,
+                        (SUM(s.total_cost) / NULLIF(COUNT(s.id), 0)) as cost_per_session,
                         (SUM(s.total_cost) / NULLIF(COUNT(DISTINCT s.user_id), 0)) as cost_per_user,
                         (SUM(s.total_cost) / NULLIF(SUM(s.message_count), 0)) as cost_per_message,
                         (SUM(s.total_cost) / NULLIF(SUM(s.total_tokens), 0) * 1000000) as cost_per_million_tokens,
@@ -1177,55 +2009,108 @@ class DatabaseHandler:
                 """, params)
                 return await cursor.fetchone()
 
-    async def get_hourly_cost_pattern(self, brand_id: Optional[int] = None, days: int = 7):
-        """Get cost patterns by hour of day"""
+    async def update_hourly_analytics(self, brand_id: int, date: str = None):
+        """Refresh a day's hour-of-day cost rollup for a brand (default today)
+
+        One sargable range seek over the day's sessions, upserted into
+        analytics_hourly_summary so the dashboard reads O(days * 24)
+        rollup rows instead of scanning the period.
+        """
+        if not date:
+            date = datetime.now().strftime("%Y-%m-%d")
         async with self.pool.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("""
+                    INSERT INTO analytics_hourly_summary (
+                        brand_id, date, hour, total_sessions, total_cost
+                    )
+                    SELECT
+                        %s, %s, s.started_hour,
+                        COUNT(s.id),
+                        COALESCE(SUM(s.total_cost), 0)
+                    FROM sessions s
+                    WHERE s.brand_id = %s
+                    AND s.started_at >= %s
+                    AND s.started_at < DATE_ADD(%s, INTERVAL 1 DAY)
+                    GROUP BY s.started_hour
+                    ON DUPLICATE KEY UPDATE
+                        total_sessions = VALUES(total_sessions),
+                        total_cost = VALUES(total_cost)
+                """, (brand_id, date, brand_id, date, date))
+
+    async def get_hourly_cost_pattern(self, brand_id: Optional[int] = None, days: int = 7):
+        """Get cost patterns by hour of day (reads the hourly rollup)"""
+        where_clause = "WHERE date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)"
+        params: List[Any] = [days]
+        if brand_id:
+            where_clause += " AND brand_id = %s"
+            params.append(brand_id)
+
+        async with self.pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                where_clause = "WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"
-                params = [days]
-                
-                if brand_id:
-                    where_clause += " AND s.brand_id = %s"
-                    params.append(brand_id)
-                
                 await cursor.execute(f"""
-                    SELECT 
-                        HOUR(s.started_at) as hour,
-                        COUNT(DISTINCT s.id) as sessions,
-                        SUM(s.total_cost) as total_cost,
-                        AVG(s.total_cost) as avg_cost
-                    FROM sessions s
+                    SELECT
+                        hour,
+                        SUM(total_sessions) as sessions,
+                        SUM(total_cost) as total_cost,
+                        SUM(total_cost) / NULLIF(SUM(total_sessions), 0) as avg_cost
+                    FROM analytics_hourly_summary
                     {where_clause}
-                    GROUP BY HOUR(s.started_at)
+                    GROUP BY hour
                     ORDER BY hour
                 """, params)
                 return await cursor.fetchall()
 
-    async def export_cost_report(self, brand_id: Optional[int] = None, start_date: str = None, end_date: str = None):
-        """Generate comprehensive cost report for export"""
-        async with self.pool.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                where_clauses = []
-                params = []
-                
-                if brand_id:
-                    where_clauses.append("s.brand_id = %s")
-                    params.append(brand_id)
-                
-                if start_date:
-                    where_clauses.append("DATE(s.started_at) >= %s")
-                    params.append(start_date)
-                
-                if end_date:
-                    where_clauses.append("DATE(s.started_at) <= %s")
-                    params.append(end_date)
-                
-                where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-                
+    async def export_cost_report(
+        self,
+        brand_id: Optional[int] = None,
+        start_date: str = None,
+        end_date: str = None,
+        last_started_at=None,
+        last_id: Optional[int] = None,
+        limit: Optional[int] = None
+    ):
+        """Generate comprehensive cost report for export
+
+        Async generator over an unbuffered (server-side) cursor: rows
+        stream straight off the wire without MySQL client-side buffering
+        or a Python list, so exports run in constant memory at any size.
+        (last_started_at, last_id) is a keyset cursor — pass the
+        id/started_at of the last row already received to resume after
+        it instead of re-sorting with OFFSET; the row id breaks ties
+        between sessions started the same second.
+        """
+        where_clauses = []
+        params = []
+
+        if brand_id:
+            where_clauses.append("s.brand_id = %s")
+            params.append(brand_id)
+
+        if start_date:
+            where_clauses.append("s.started_date >= %s")
+            params.append(start_date)
+
+        if end_date:
+            where_clauses.append("s.started_date <= %s")
+            params.append(end_date)
+
+        if last_started_at is not None and last_id is not None:
+            where_clauses.append("(s.started_at, s.id) < (%s, %s)")
+            params.extend([last_started_at, last_id])
+
+        where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT %s"
+            params.append(limit)
+
+        async with self.pool.get_read_connection() as conn:
+            async with conn.cursor(aiomysql.SSDictCursor) as cursor:
                 await cursor.execute(f"""
-                    SELECT 
+                    SELECT
                         s.session_id,
-                        DATE(s.started_at) as date,
+                        s.started_date as date,
                         TIME(s.started_at) as time,
                         b.brand_display_name,
                         u.email as user_email,
@@ -1239,14 +2124,18 @@ class DatabaseHandler:
                         s.output_cost,
                         s.total_cost,
                         s.duration_seconds,
-                        s.status
+                        s.status,
+                        s.started_at,
+                        s.id
                     FROM sessions s
                     LEFT JOIN brands b ON s.brand_id = b.id
                     LEFT JOIN users u ON s.user_id = u.id
                     {where_clause}
-                    ORDER BY s.started_at DESC
+                    ORDER BY s.started_at DESC, s.id DESC
+                    {limit_clause}
                 """, params)
-                return await cursor.fetchall()
+                async for row in cursor:
+                    yield row
     
 # Global database handler instance
 db_handler = DatabaseHandler()
\ No newline at end of file
@@ -3,6 +3,7 @@ Database Management Utilities
 Command-line tools for managing the chatbot database
 """
 
+import argparse
 import asyncio
 import sys
 from datetime import datetime, timedelta
@@ -14,9 +15,106 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+async def _anext_or_none(iterator):
+    """Advance an async iterator, returning None when exhausted
+
+    Stand-in for ``await anext(it, None)`` — the anext() builtin is
+    Python 3.10+ and this project supports 3.9.
+    """
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
 class DBUtils:
     """Database utility functions"""
-    
+
+    # SQL for the brand-filterable queries, specialized once at
+    # class-definition time into a no-filter and a brand-filter
+    # variant. Each call then sends a byte-identical literal, so the
+    # server sees two stable statements instead of per-call f-strings
+    # and can reuse the parse/plan work.
+    _STATS_ROLLUP_SQL = """
+        SELECT
+            COALESCE(SUM(total_sessions), 0) as total_sessions,
+            COALESCE(SUM(emails_sent), 0) as emails_sent,
+            COALESCE(SUM(avg_session_duration * total_sessions), 0) as duration_sum,
+            COALESCE(SUM(avg_messages_per_session * total_sessions), 0) as message_sum,
+            COALESCE(SUM(total_input_tokens), 0) as total_input_tokens,
+            COALESCE(SUM(total_output_tokens), 0) as total_output_tokens,
+            COALESCE(SUM(total_tokens), 0) as total_tokens
+        FROM analytics_summary
+        WHERE date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        AND date < CURDATE()
+        {brand_filter}
+    """
+    _STATS_ROLLUP_ALL_SQL = _STATS_ROLLUP_SQL.format(brand_filter="")
+    _STATS_ROLLUP_BRAND_SQL = _STATS_ROLLUP_SQL.format(
+        brand_filter="AND brand_id = %s")
+
+    _STATS_TODAY_SQL = """
+        SELECT
+            COUNT(s.id) as total_sessions,
+            SUM(s.email_sent) as emails_sent,
+            COALESCE(SUM(s.duration_seconds), 0) as duration_sum,
+            COALESCE(SUM(s.message_count), 0) as message_sum,
+            COALESCE(SUM(s.total_input_tokens), 0) as total_input_tokens,
+            COALESCE(SUM(s.total_output_tokens), 0) as total_output_tokens,
+            COALESCE(SUM(s.total_tokens), 0) as total_tokens
+        FROM sessions s
+        WHERE s.started_at >= CURDATE()
+        {brand_filter}
+    """
+    _STATS_TODAY_ALL_SQL = _STATS_TODAY_SQL.format(brand_filter="")
+    _STATS_TODAY_BRAND_SQL = _STATS_TODAY_SQL.format(
+        brand_filter="AND s.brand_id = %s")
+
+    # GROUP BY in a derived table instead of COUNT(DISTINCT): the
+    # deduplication happens during an index-only scan of the covering
+    # (brand_id, started_at, ..., user_id) index and the outer query
+    # just counts groups. The IS NOT NULL mirrors COUNT(DISTINCT)'s
+    # null handling, which would otherwise surface as a NULL group.
+    _STATS_UNIQUE_SQL = """
+        SELECT COUNT(*) as unique_users
+        FROM (
+            SELECT 1
+            FROM sessions s
+            WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
+            AND s.user_id IS NOT NULL
+            {brand_filter}
+            GROUP BY s.user_id
+        ) t
+    """
+    _STATS_UNIQUE_ALL_SQL = _STATS_UNIQUE_SQL.format(brand_filter="")
+    _STATS_UNIQUE_BRAND_SQL = _STATS_UNIQUE_SQL.format(
+        brand_filter="AND s.brand_id = %s")
+
+    _EXPORT_SESSIONS_SQL = """
+        SELECT s.*, u.name, u.email, u.phone, b.brand_key, b.brand_display_name
+        FROM sessions s
+        LEFT JOIN users u ON s.user_id = u.id
+        LEFT JOIN brands b ON s.brand_id = b.id
+        WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
+        {brand_filter}
+        ORDER BY s.id DESC
+    """
+    _EXPORT_SESSIONS_ALL_SQL = _EXPORT_SESSIONS_SQL.format(brand_filter="")
+    _EXPORT_SESSIONS_BRAND_SQL = _EXPORT_SESSIONS_SQL.format(
+        brand_filter="AND s.brand_id = %s")
+
+    _EXPORT_MESSAGES_SQL = """
+        SELECT m.session_id, m.role, m.content, m.created_at
+        FROM messages m
+        JOIN sessions s ON m.session_id = s.id
+        WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
+        {brand_filter}
+        ORDER BY m.session_id DESC, m.message_order ASC
+    """
+    _EXPORT_MESSAGES_ALL_SQL = _EXPORT_MESSAGES_SQL.format(brand_filter="")
+    _EXPORT_MESSAGES_BRAND_SQL = _EXPORT_MESSAGES_SQL.format(
+        brand_filter="AND s.brand_id = %s")
+
     def __init__(self):
         self.db_config = {
             'host': os.getenv('DB_HOST', 'localhost'),
@@ -26,16 +124,65 @@ class DBUtils:
             'db': os.getenv('DB_NAME', 'chatbot_system'),
             'charset': 'utf8mb4'
         }
-    
-    async def get_connection(self):
-        """Get database connection"""
-        return await aiomysql.connect(**self.db_config)
-    
+        self.pool = None
+        # brand_key -> id, memoized for the life of the process; brand
+        # rows don't change underneath a single CLI invocation
+        self._brand_id_cache: dict = {}
+
+    async def init(self):
+        """Create the shared connection pool
+
+        One pool for the process instead of a fresh TCP + auth handshake
+        per method call; sized small because the CLI runs a handful of
+        queries, not server traffic.
+        """
+        if self.pool is None:
+            self.pool = await aiomysql.create_pool(
+                minsize=1, maxsize=10, pool_recycle=1800, **self.db_config
+            )
+
+    async def close(self):
+        """Close the pool and wait for connections to drain"""
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def _fetch_stats_row(self, query: str, params: list):
+        """Run one aggregate query on its own pooled connection
+
+        Lets independent SELECTs overlap under asyncio.gather — each
+        coroutine holds a different connection, so the server works on
+        them in parallel instead of serially down one socket.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchone()
+
+    async def _brand_id(self, brand_key: str) -> Optional[int]:
+        """Resolve a brand_key to its id, at most one query per key
+
+        Every brand-scoped command starts with this lookup; caching it
+        means a command that touches the same brand repeatedly only
+        pays for the round trip once.
+        """
+        if brand_key not in self._brand_id_cache:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        "SELECT id FROM brands WHERE brand_key = %s",
+                        (brand_key,)
+                    )
+                    row = await cursor.fetchone()
+            self._brand_id_cache[brand_key] = row[0] if row else None
+        return self._brand_id_cache[brand_key]
+
+
     async def add_brand(self, brand_key: str, display_name: str, email: str, 
                        vector_store_id: str, recipients: list):
         """Add a new brand to the system"""
-        conn = await self.get_connection()
-        try:
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
                 # Insert brand
                 await cursor.execute("""
@@ -45,59 +192,69 @@ class DBUtils:
                 """, (brand_key, display_name, email, vector_store_id))
                 
                 brand_id = cursor.lastrowid
-                
-                # Insert recipients
-                for recipient in recipients:
-                    await cursor.execute("""
-                        INSERT INTO brand_recipients (brand_id, email, is_active)
-                        VALUES (%s, %s, TRUE)
-                    """, (brand_id, recipient))
-                
+
+                # Insert recipients as one multi-row statement; same
+                # transaction, so brand + recipients stay atomic
+                await cursor.executemany("""
+                    INSERT INTO brand_recipients (brand_id, email, is_active)
+                    VALUES (%s, %s, TRUE)
+                """, [(brand_id, recipient) for recipient in recipients])
+
                 await conn.commit()
+                # Seed the lookup cache so a follow-up command in the
+                # same process sees the new brand without a query
+                self._brand_id_cache[brand_key] = brand_id
                 print(f"✅ Brand '{display_name}' added successfully!")
                 print(f"   Brand ID: {brand_id}")
                 print(f"   Brand Key: {brand_key}")
                 print(f"   Recipients: {', '.join(recipients)}")
-        finally:
-            conn.close()
     
     async def list_brands(self):
         """List all brands"""
-        conn = await self.get_connection()
-        try:
+        async with self.pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
+                # Session and user totals come from the incrementally
+                # maintained rollups (analytics_summary via triggers,
+                # user_brand_interactions via the app's upserts) instead
+                # of aggregating the whole sessions table per call
                 await cursor.execute("""
-                    SELECT b.*, 
-                           COUNT(DISTINCT s.id) as total_sessions,
-                           COUNT(DISTINCT s.user_id) as total_users
+                    SELECT b.*,
+                           COALESCE(a.total_sessions, 0) as total_sessions,
+                           COALESCE(i.total_users, 0) as total_users
                     FROM brands b
-                    LEFT JOIN sessions s ON b.id = s.brand_id
-                    GROUP BY b.id
+                    LEFT JOIN (
+                        SELECT brand_id, SUM(total_sessions) as total_sessions
+                        FROM analytics_summary
+                        GROUP BY brand_id
+                    ) a ON a.brand_id = b.id
+                    LEFT JOIN (
+                        SELECT brand_id, COUNT(*) as total_users
+                        FROM user_brand_interactions
+                        GROUP BY brand_id
+                    ) i ON i.brand_id = b.id
                 """)
                 brands = await cursor.fetchall()
-                
-                print("\n" + "="*80)
-                print("BRANDS")
-                print("="*80)
-                
+
+                # Collect the report and emit it in one write rather
+                # than a syscall per line
+                lines = ["\n" + "="*80, "BRANDS", "="*80]
+
                 for brand in brands:
                     status = "🟢 Active" if brand['is_active'] else "🔴 Inactive"
-                    print(f"\n{brand['brand_display_name']} ({brand['brand_key']})")
-                    print(f"  Status: {status}")
-                    print(f"  Email: {brand['brand_email']}")
-                    print(f"  Vector Store: {brand['vector_store_id']}")
-                    print(f"  Total Sessions: {brand['total_sessions']}")
-                    print(f"  Total Users: {brand['total_users']}")
-                    print(f"  Created: {brand['created_at']}")
-                
-                print("\n" + "="*80 + "\n")
-        finally:
-            conn.close()
+                    lines.append(f"\n{brand['brand_display_name']} ({brand['brand_key']})")
+                    lines.append(f"  Status: {status}")
+                    lines.append(f"  Email: {brand['brand_email']}")
+                    lines.append(f"  Vector Store: {brand['vector_store_id']}")
+                    lines.append(f"  Total Sessions: {brand['total_sessions']}")
+                    lines.append(f"  Total Users: {brand['total_users']}")
+                    lines.append(f"  Created: {brand['created_at']}")
+
+                lines.append("\n" + "="*80 + "\n")
+                sys.stdout.write("\n".join(lines) + "\n")
     
     async def list_users(self, limit: int = 20):
         """List recent users"""
-        conn = await self.get_connection()
-        try:
+        async with self.pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT u.*, COUNT(s.id) as session_count
@@ -108,200 +265,259 @@ class DBUtils:
                     LIMIT %s
                 """, (limit,))
                 users = await cursor.fetchall()
-                
-                print("\n" + "="*80)
-                print(f"RECENT USERS (Last {limit})")
-                print("="*80)
-                
+
+                # One buffered write for the whole listing; matters when
+                # limit is cranked up
+                lines = ["\n" + "="*80, f"RECENT USERS (Last {limit})", "="*80]
+
                 for user in users:
-                    print(f"\n{user['name'] or 'Anonymous'} ({user['email']})")
-                    print(f"  Phone: {user['phone'] or 'N/A'}")
-                    print(f"  Location: {user['city']}, {user['country']}")
-                    print(f"  Sessions: {user['session_count']}")
-                    print(f"  Last Seen: {user['last_seen']}")
-                
-                print("\n" + "="*80 + "\n")
-        finally:
-            conn.close()
+                    lines.append(f"\n{user['name'] or 'Anonymous'} ({user['email']})")
+                    lines.append(f"  Phone: {user['phone'] or 'N/A'}")
+                    lines.append(f"  Location: {user['city']}, {user['country']}")
+                    lines.append(f"  Sessions: {user['session_count']}")
+                    lines.append(f"  Last Seen: {user['last_seen']}")
+
+                lines.append("\n" + "="*80 + "\n")
+                sys.stdout.write("\n".join(lines) + "\n")
     
     async def get_stats(self, brand_key: Optional[str] = None, days: int = 30):
-        """Get system statistics"""
-        conn = await self.get_connection()
-        try:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                # Build query based on brand filter
-                brand_filter = ""
-                params = [days]
-                
-                if brand_key:
-                    await cursor.execute(
-                        "SELECT id FROM brands WHERE brand_key = %s",
-                        (brand_key,)
-                    )
-                    brand = await cursor.fetchone()
-                    if brand:
-                        brand_filter = "AND s.brand_id = %s"
-                        params.append(brand['id'])
-                
-                # Get statistics
-                await cursor.execute(f"""
-                    SELECT 
-                        COUNT(DISTINCT s.id) as total_sessions,
-                        COUNT(DISTINCT s.user_id) as unique_users,
-                        COUNT(DISTINCT CASE WHEN s.email_sent THEN s.id END) as emails_sent,
-                        AVG(s.duration_seconds) as avg_duration,
-                        AVG(s.message_count) as avg_messages,
-                        SUM(s.total_input_tokens) as total_input_tokens,
-                        SUM(s.total_output_tokens) as total_output_tokens,
-                        SUM(s.total_tokens) as total_tokens
-                    FROM sessions s
-                    WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    {brand_filter}
-                """, params)
-                
-                stats = await cursor.fetchone()
-                
-                brand_name = f"Brand: {brand_key}" if brand_key else "All Brands"
-                
-                print("\n" + "="*80)
-                print(f"STATISTICS - Last {days} Days ({brand_name})")
-                print("="*80)
-                print(f"\n📊 Sessions")
-                print(f"  Total Sessions: {stats['total_sessions']}")
-                print(f"  Unique Users: {stats['unique_users']}")
-                print(f"  Emails Sent: {stats['emails_sent']}")
-                
-                print(f"\n⏱️  Performance")
-                print(f"  Avg Duration: {int(stats['avg_duration'] or 0)} seconds")
-                print(f"  Avg Messages: {float(stats['avg_messages'] or 0):.1f}")
-                
-                print(f"\n🔤 Token Usage")
-                print(f"  Input Tokens: {stats['total_input_tokens']:,}")
-                print(f"  Output Tokens: {stats['total_output_tokens']:,}")
-                print(f"  Total Tokens: {stats['total_tokens']:,}")
-                
-                # Cost estimation (adjust rates as needed)
-                input_cost = (stats['total_input_tokens'] or 0) * 0.00001  # $0.01 per 1K tokens
-                output_cost = (stats['total_output_tokens'] or 0) * 0.00003  # $0.03 per 1K tokens
-                total_cost = input_cost + output_cost
-                
-                print(f"\n💰 Estimated Cost")
-                print(f"  Input Cost: ${input_cost:.4f}")
-                print(f"  Output Cost: ${output_cost:.4f}")
-                print(f"  Total Cost: ${total_cost:.4f}")
-                
-                print("\n" + "="*80 + "\n")
-        finally:
-            conn.close()
+        """Get system statistics
+
+        Completed days are summed from the analytics_summary rollup
+        (O(days) rows) instead of re-aggregating the sessions table;
+        only today's partial day and the distinct-user count — which
+        cannot be added up across days — touch sessions directly.
+        The three aggregates are independent of each other, so they run
+        concurrently on separate pooled connections; only the brand-id
+        lookup has to resolve first because its result parameterizes
+        the rest.
+        """
+        # Resolve the brand filter, falling back to the unfiltered
+        # variants when the key is unknown
+        brand_params = []
+
+        if brand_key:
+            brand_id = await self._brand_id(brand_key)
+            if brand_id is not None:
+                brand_params.append(brand_id)
+
+        if brand_params:
+            rolled_query = self._STATS_ROLLUP_BRAND_SQL
+            today_query = self._STATS_TODAY_BRAND_SQL
+            unique_query = self._STATS_UNIQUE_BRAND_SQL
+        else:
+            rolled_query = self._STATS_ROLLUP_ALL_SQL
+            today_query = self._STATS_TODAY_ALL_SQL
+            unique_query = self._STATS_UNIQUE_ALL_SQL
+
+        # Completed days from the rollup (the stored per-day averages
+        # are re-weighted by session count so the window-wide averages
+        # come out right), today's partial day live, and the distinct
+        # users — which cannot be summed across daily rows
+        rolled, today, unique = await asyncio.gather(
+            self._fetch_stats_row(rolled_query, [days] + brand_params),
+            self._fetch_stats_row(today_query, brand_params),
+            self._fetch_stats_row(unique_query, [days] + brand_params),
+        )
+
+        total_sessions = int(rolled['total_sessions']) + int(today['total_sessions'])
+        duration_sum = float(rolled['duration_sum']) + float(today['duration_sum'])
+        message_sum = float(rolled['message_sum']) + float(today['message_sum'])
+        stats = {
+            'total_sessions': total_sessions,
+            'unique_users': unique['unique_users'],
+            'emails_sent': int(rolled['emails_sent']) + int(today['emails_sent'] or 0),
+            'avg_duration': duration_sum / total_sessions if total_sessions else 0,
+            'avg_messages': message_sum / total_sessions if total_sessions else 0,
+            'total_input_tokens': int(rolled['total_input_tokens']) + int(today['total_input_tokens']),
+            'total_output_tokens': int(rolled['total_output_tokens']) + int(today['total_output_tokens']),
+            'total_tokens': int(rolled['total_tokens']) + int(today['total_tokens']),
+        }
+
+        brand_name = f"Brand: {brand_key}" if brand_key else "All Brands"
+        
+        print("\n" + "="*80)
+        print(f"STATISTICS - Last {days} Days ({brand_name})")
+        print("="*80)
+        print(f"\n📊 Sessions")
+        print(f"  Total Sessions: {stats['total_sessions']}")
+        print(f"  Unique Users: {stats['unique_users']}")
+        print(f"  Emails Sent: {stats['emails_sent']}")
+        
+        print(f"\n⏱️  Performance")
+        print(f"  Avg Duration: {int(stats['avg_duration'])} seconds")
+        print(f"  Avg Messages: {stats['avg_messages']:.1f}")
+        
+        print(f"\n🔤 Token Usage")
+        print(f"  Input Tokens: {stats['total_input_tokens']:,}")
+        print(f"  Output Tokens: {stats['total_output_tokens']:,}")
+        print(f"  Total Tokens: {stats['total_tokens']:,}")
+        
+        # Cost estimation (adjust rates as needed); the token
+        # totals are already COALESCE'd server-side, so no None
+        # guards are needed here
+        input_cost = stats['total_input_tokens'] * 0.00001  # $0.01 per 1K tokens
+        output_cost = stats['total_output_tokens'] * 0.00003  # $0.03 per 1K tokens
+        total_cost = input_cost + output_cost
+        
+        print(f"\n💰 Estimated Cost")
+        print(f"  Input Cost: ${input_cost:.4f}")
+        print(f"  Output Cost: ${output_cost:.4f}")
+        print(f"  Total Cost: ${total_cost:.4f}")
+        
+        print("\n" + "="*80 + "\n")
     
-    async def cleanup_old_sessions(self, days: int = 90):
-        """Archive or delete old sessions"""
-        conn = await self.get_connection()
-        try:
+    async def cleanup_old_sessions(self, days: int = 90, batch_size: int = 1000):
+        """Archive or delete old sessions
+
+        Deletes in LIMIT-ed batches with a commit per batch, so the row
+        locks and undo log stay bounded no matter how big the backlog
+        is and concurrent session writers are never blocked for long.
+        Each batch is an index range scan on (status, started_at).
+        """
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                # Delete sessions older than specified days
-                await cursor.execute("""
-                    DELETE FROM sessions
-                    WHERE started_at < DATE_SUB(NOW(), INTERVAL %s DAY)
-                    AND status = 'ended'
-                """, (days,))
-                
-                deleted_count = cursor.rowcount
-                await conn.commit()
-                
+                deleted_count = 0
+                while True:
+                    await cursor.execute("""
+                        DELETE FROM sessions
+                        WHERE started_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+                        AND status = 'ended'
+                        LIMIT %s
+                    """, (days, batch_size))
+                    deleted_count += cursor.rowcount
+                    await conn.commit()
+
+                    if cursor.rowcount < batch_size:
+                        break
+                    print(f"  ... {deleted_count} deleted")
+                    # Brief pause between batches to let other writers in
+                    await asyncio.sleep(0.05)
+
                 print(f"✅ Cleaned up {deleted_count} sessions older than {days} days")
-        finally:
-            conn.close()
     
     async def export_conversations(self, output_file: str, brand_key: Optional[str] = None,
-                                   days: int = 7):
-        """Export conversations to JSON file"""
+                                   days: int = 7,
+                                   ndjson: Optional[bool] = None):
+        """Export conversations to a JSON or NDJSON file
+
+        With ndjson (explicit flag, or implied by a .ndjson output
+        extension) each conversation is one JSON object per line —
+        the interchange format jq/Spark-style tools can consume
+        incrementally, and the right choice for large dumps where a
+        single top-level array is unusable until fully written.
+
+        Written as a stream end to end: sessions and messages each come
+        off their own server-side cursor (a SSCursor pins its
+        connection until drained, so the two streams need separate
+        pooled connections) sorted by session id DESC, and are
+        merge-joined row by row. Each conversation is serialized to the
+        file as soon as it is complete, so peak memory is one
+        conversation instead of the whole export.
+        """
         import json
-        
-        conn = await self.get_connection()
-        try:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                # Build query
-                brand_filter = ""
-                params = [days]
-                
-                if brand_key:
-                    await cursor.execute(
-                        "SELECT id FROM brands WHERE brand_key = %s",
-                        (brand_key,)
-                    )
-                    brand = await cursor.fetchone()
-                    if brand:
-                        brand_filter = "AND s.brand_id = %s"
-                        params.append(brand['id'])
-                
-                # Get sessions
-                await cursor.execute(f"""
-                    SELECT s.*, u.name, u.email, u.phone, b.brand_key, b.brand_display_name
-                    FROM sessions s
-                    LEFT JOIN users u ON s.user_id = u.id
-                    LEFT JOIN brands b ON s.brand_id = b.id
-                    WHERE s.started_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    {brand_filter}
-                    ORDER BY s.started_at DESC
-                """, params)
-                
-                sessions = await cursor.fetchall()
-                
-                # Get messages for each session
-                export_data = []
-                for session in sessions:
-                    await cursor.execute("""
-                        SELECT role, content, created_at
-                        FROM messages
-                        WHERE session_id = %s
-                        ORDER BY message_order ASC
-                    """, (session['id'],))
-                    
-                    messages = await cursor.fetchall()
-                    
-                    # Convert datetime objects to strings
-                    session_data = dict(session)
-                    session_data['started_at'] = str(session_data['started_at'])
-                    session_data['ended_at'] = str(session_data['ended_at']) if session_data['ended_at'] else None
-                    session_data['last_activity'] = str(session_data['last_activity'])
-                    
-                    session_data['messages'] = []
-                    for msg in messages:
-                        session_data['messages'].append({
-                            'role': msg['role'],
-                            'content': msg['content'],
-                            'timestamp': str(msg['created_at'])
-                        })
-                    
-                    export_data.append(session_data)
-                
-                # Write to file
-                with open(output_file, 'w') as f:
-                    json.dump(export_data, f, indent=2)
-                
-                print(f"✅ Exported {len(export_data)} conversations to {output_file}")
-        finally:
-            conn.close()
+
+        if ndjson is None:
+            ndjson = output_file.endswith('.ndjson')
+
+        # Resolve the brand filter
+        params = [days]
+
+        if brand_key:
+            brand_id = await self._brand_id(brand_key)
+            if brand_id is not None:
+                params.append(brand_id)
+
+        if len(params) > 1:
+            sessions_query = self._EXPORT_SESSIONS_BRAND_SQL
+            messages_query = self._EXPORT_MESSAGES_BRAND_SQL
+        else:
+            sessions_query = self._EXPORT_SESSIONS_ALL_SQL
+            messages_query = self._EXPORT_MESSAGES_ALL_SQL
+
+        exported = 0
+        async with self.pool.acquire() as sess_conn, \
+                   self.pool.acquire() as msg_conn:
+            # Sessions keep the dict cursor — each row is serialized as
+            # a JSON object keyed by column name, which is exactly the
+            # dict the cursor builds. Messages are the hot stream (many
+            # rows, four known columns), so they come through the plain
+            # tuple cursor with positional access and skip a dict
+            # allocation plus hashed lookups per row.
+            async with sess_conn.cursor(aiomysql.SSDictCursor) as cursor, \
+                       msg_conn.cursor(aiomysql.SSCursor) as msg_cursor:
+                # Sessions stream unbuffered; id DESC matches recency
+                # (auto-increment) and sets the merge order
+                await cursor.execute(sessions_query, params)
+
+                # Messages stream with the same window predicate (via a
+                # join back to sessions) and the same session order, so
+                # neither side needs the other's ids materialized
+                await msg_cursor.execute(messages_query, params)
+                msg_iter = msg_cursor.__aiter__()
+
+                # Column positions in _EXPORT_MESSAGES_SQL's SELECT list
+                SID, ROLE, CONTENT, CREATED_AT = range(4)
+
+                pending = None
+                # 1 MiB buffer so the many small json.dump writes
+                # amortize into few syscalls
+                with open(output_file, 'w', buffering=1024 * 1024) as f:
+                    if not ndjson:
+                        f.write('[\n')
+                    async for session in cursor:
+                        rows = []
+                        if pending is None:
+                            pending = await _anext_or_none(msg_iter)
+                        # The two NOW() evaluations can straddle a tick;
+                        # drop message groups for any session id the
+                        # session stream doesn't cover rather than stall
+                        while pending is not None and pending[SID] > session['id']:
+                            pending = await _anext_or_none(msg_iter)
+                        while pending is not None and pending[SID] == session['id']:
+                            rows.append(pending)
+                            pending = await _anext_or_none(msg_iter)
+
+                        session_data = dict(session)
+                        # Reshape in one comprehension pass rather than
+                        # dict-building inside the await loop above
+                        session_data['messages'] = [
+                            {
+                                'role': m[ROLE],
+                                'content': m[CONTENT],
+                                'timestamp': m[CREATED_AT]
+                            }
+                            for m in rows
+                        ]
+
+                        # default=str stringifies every datetime/date in
+                        # C instead of per-field Python conversions (and
+                        # covers columns like created_at that the manual
+                        # list missed); compact separators keep the file
+                        # small
+                        if ndjson:
+                            json.dump(session_data, f, default=str, separators=(',', ':'))
+                            f.write('\n')
+                        else:
+                            if exported:
+                                f.write(',\n')
+                            json.dump(session_data, f, default=str, separators=(',', ':'))
+                        exported += 1
+                    if not ndjson:
+                        f.write('\n]\n')
+
+        print(f"✅ Exported {exported} conversations to {output_file}")
     
     async def update_recipient(self, brand_key: str, action: str, email: str):
         """Add or remove recipient for a brand"""
-        conn = await self.get_connection()
-        try:
+        brand_id = await self._brand_id(brand_key)
+
+        if brand_id is None:
+            print(f"❌ Brand '{brand_key}' not found")
+            return
+
+        async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                # Get brand ID
-                await cursor.execute(
-                    "SELECT id FROM brands WHERE brand_key = %s",
-                    (brand_key,)
-                )
-                brand = await cursor.fetchone()
-                
-                if not brand:
-                    print(f"❌ Brand '{brand_key}' not found")
-                    return
-                
-                brand_id = brand[0]
-                
                 if action == 'add':
                     await cursor.execute("""
                         INSERT INTO brand_recipients (brand_id, email, is_active)
@@ -319,112 +535,124 @@ class DBUtils:
                     """, (brand_id, email))
                     await conn.commit()
                     print(f"✅ Removed recipient '{email}' from brand '{brand_key}'")
-        finally:
-            conn.close()
 
 
-async def main():
-    """Command-line interface"""
-    utils = DBUtils()
-    
-    if len(sys.argv) < 2:
-        print("""
-Usage: python db_utils.py <command> [options]
-
-Commands:
-  list-brands                    List all brands
-  list-users [limit]             List recent users (default: 20)
-  stats [brand_key] [days]       Show statistics (default: 30 days)
-  add-brand                      Interactive brand addition
-  cleanup [days]                 Delete old sessions (default: 90 days)
-  export <file> [brand] [days]   Export conversations to JSON
-  add-recipient <brand> <email>  Add email recipient to brand
-  remove-recipient <brand> <email> Remove email recipient from brand
-
-Examples:
+def build_parser() -> argparse.ArgumentParser:
+    """Build the CLI parser
+
+    argparse handles help, usage errors and type coercion before any
+    database work happens, so --help and bad invocations return
+    instantly without paying for pool setup.
+    """
+    parser = argparse.ArgumentParser(
+        prog='db_utils.py',
+        description='Command-line tools for managing the chatbot database',
+        epilog="""examples:
   python db_utils.py list-brands
   python db_utils.py stats gbpseo 7
   python db_utils.py export conversations.json whitedigital 30
-  python db_utils.py add-recipient gbpseo hello@gbpseo.in
-        """)
-        return
-    
-    command = sys.argv[1]
-    
+  python db_utils.py export conversations.ndjson whitedigital 30
+  python db_utils.py add-recipient gbpseo hello@gbpseo.in""",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('list-brands', help='List all brands')
+
+    p = sub.add_parser('list-users', help='List recent users')
+    p.add_argument('limit', nargs='?', type=int, default=20,
+                   help='number of users to show (default: 20)')
+
+    p = sub.add_parser('stats', help='Show statistics')
+    p.add_argument('brand_key', nargs='?', default=None,
+                   help='restrict to one brand')
+    p.add_argument('days', nargs='?', type=int, default=30,
+                   help='window in days (default: 30)')
+
+    sub.add_parser('add-brand', help='Interactive brand addition')
+
+    p = sub.add_parser('cleanup', help='Delete old sessions')
+    p.add_argument('days', nargs='?', type=int, default=90,
+                   help='delete sessions older than this (default: 90)')
+
+    p = sub.add_parser('export', help='Export conversations to JSON')
+    p.add_argument('output_file', help='destination file')
+    p.add_argument('brand_key', nargs='?', default=None,
+                   help='restrict to one brand')
+    p.add_argument('days', nargs='?', type=int, default=7,
+                   help='window in days (default: 7)')
+    p.add_argument('--ndjson', action='store_true', default=None,
+                   help='one JSON object per line for streaming '
+                        'consumers (implied by a .ndjson extension)')
+
+    p = sub.add_parser('add-recipient', help='Add email recipient to brand')
+    p.add_argument('brand_key')
+    p.add_argument('email')
+
+    p = sub.add_parser('remove-recipient',
+                       help='Remove email recipient from brand')
+    p.add_argument('brand_key')
+    p.add_argument('email')
+
+    return parser
+
+
+async def main():
+    """Command-line interface"""
+    args = build_parser().parse_args()
+    utils = DBUtils()
+    await utils.init()
+
     try:
-        if command == 'list-brands':
+        if args.command == 'list-brands':
             await utils.list_brands()
-        
-        elif command == 'list-users':
-            limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
-            await utils.list_users(limit)
-        
-        elif command == 'stats':
-            brand_key = sys.argv[2] if len(sys.argv) > 2 else None
-            days = int(sys.argv[3]) if len(sys.argv) > 3 else 30
-            await utils.get_stats(brand_key, days)
-        
-        elif command == 'add-brand':
+
+        elif args.command == 'list-users':
+            await utils.list_users(args.limit)
+
+        elif args.command == 'stats':
+            await utils.get_stats(args.brand_key, args.days)
+
+        elif args.command == 'add-brand':
             print("\n=== Add New Brand ===\n")
             brand_key = input("Brand key (lowercase, no spaces): ")
             display_name = input("Display name: ")
             email = input("Brand email: ")
             vector_store_id = input("Vector store ID: ")
-            
+
             recipients = []
             while True:
                 recipient = input("Recipient email (press Enter to finish): ")
                 if not recipient:
                     break
                 recipients.append(recipient)
-            
+
             if recipients:
                 await utils.add_brand(brand_key, display_name, email, vector_store_id, recipients)
             else:
                 print("❌ At least one recipient email is required")
-        
-        elif command == 'cleanup':
-            days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
-            confirm = input(f"Delete sessions older than {days} days? (yes/no): ")
+
+        elif args.command == 'cleanup':
+            confirm = input(f"Delete sessions older than {args.days} days? (yes/no): ")
             if confirm.lower() == 'yes':
-                await utils.cleanup_old_sessions(days)
-        
-        elif command == 'export':
-            if len(sys.argv) < 3:
-                print("❌ Please specify output file")
-                return
-            
-            output_file = sys.argv[2]
-            brand_key = sys.argv[3] if len(sys.argv) > 3 else None
-            days = int(sys.argv[4]) if len(sys.argv) > 4 else 7
-            
-            await utils.export_conversations(output_file, brand_key, days)
-        
-        elif command == 'add-recipient':
-            if len(sys.argv) < 4:
-                print("❌ Usage: add-recipient <brand_key> <email>")
-                return
-            
-            brand_key = sys.argv[2]
-            email = sys.argv[3]
-            await utils.update_recipient(brand_key, 'add', email)
-        
-        elif command == 'remove-recipient':
-            if len(sys.argv) < 4:
-                print("❌ Usage: remove-recipient <brand_key> <email>")
-                return
-            
-            brand_key = sys.argv[2]
-            email = sys.argv[3]
-            await utils.update_recipient(brand_key, 'remove', email)
-        
-        else:
-            print(f"❌ Unknown command: {command}")
-    
+                await utils.cleanup_old_sessions(args.days)
+
+        elif args.command == 'export':
+            await utils.export_conversations(args.output_file, args.brand_key,
+                                             args.days, ndjson=args.ndjson)
+
+        elif args.command == 'add-recipient':
+            await utils.update_recipient(args.brand_key, 'add', args.email)
+
+        elif args.command == 'remove-recipient':
+            await utils.update_recipient(args.brand_key, 'remove', args.email)
+
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await utils.close()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,22 @@
 from __future__ import annotations
 
 import asyncio
+
+# uvloop halves per-socket event-loop overhead, which dominates when DB
+# queries are sub-millisecond. Install it before anything touches the
+# loop; uvicorn picks it up automatically when run as a module too.
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
 import os
 import uuid
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
+import json
 import re
 import pytz
 import secrets
@@ -15,12 +27,12 @@ from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
 from fastapi.staticfiles import StaticFiles
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import aiosmtplib
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
 from contextlib import asynccontextmanager
 from decimal import Decimal
-import aiomysql
+from database import aiomysql  # asyncmy when installed, aiomysql otherwise
 from agents import (
     Agent,
     FileSearchTool,
@@ -34,7 +46,7 @@ from agents import (
 from openai.types.shared.reasoning import Reasoning
 
 # Import database handler
-from database import db_handler, db_pool
+from database import db_handler, db_pool, decompress_html
 import logging
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -311,10 +323,58 @@ BRAND_NAMES = {
 
 # ==================== SESSION STORAGE (In-Memory Cache) ====================
 
-active_sessions: Dict[str, ConversationSession] = {}
+SESSION_CACHE_MAX = 5000
+SESSION_IDLE_TTL = 3600  # seconds idle before a cached session is dropped
+
+
+class SessionCache(dict):
+    """Bounded in-memory session store with idle eviction
+
+    The cache is a working set, not the source of truth — every message
+    and token count is already persisted per turn, and
+    get_or_create_session rehydrates an evicted session_id from MySQL
+    transparently — so idle entries can simply be dropped instead of
+    accumulating ConversationSession objects (with full histories)
+    forever. dict insertion order doubles as the LRU order: reads and
+    writes move the entry to the back, and writes evict idle or
+    overflow entries from the front.
+    """
+
+    def __getitem__(self, key):
+        session = super().__getitem__(key)
+        super().__delitem__(key)
+        super().__setitem__(key, session)
+        return session
+
+    def __setitem__(self, key, session):
+        if key in self:
+            super().__delitem__(key)
+        super().__setitem__(key, session)
+        self._evict()
+
+    def _evict(self):
+        now = datetime.now()
+        # Front of the dict is least recently used, which is also the
+        # longest idle; stop at the first live entry
+        while self:
+            key = next(iter(self))
+            session = dict.__getitem__(self, key)
+            if (now - session.last_activity).total_seconds() > SESSION_IDLE_TTL:
+                dict.__delitem__(self, key)
+            else:
+                break
+        while len(self) > SESSION_CACHE_MAX:
+            dict.__delitem__(self, next(iter(self)))
+
 
+active_sessions: Dict[str, ConversationSession] = SessionCache()
 
-async def get_or_create_session(session_id: Optional[str] = None, brand: str = "gbpseo") -> ConversationSession:
+
+async def get_or_create_session(
+    session_id: Optional[str] = None,
+    brand: str = "gbpseo",
+    user_id: Optional[int] = None
+) -> ConversationSession:
     """Get existing session or create new one with DB sync"""
     
     # Check in-memory cache first
@@ -322,29 +382,28 @@ async def get_or_create_session(session_id: Optional[str] = None, brand: str = "
         session = active_sessions[session_id]
         session.last_activity = datetime.now()
         # Update activity in DB (non-blocking)
-        await db_handler.update_session_activity(session_id)
+        db_handler.update_session_activity(session_id)
         return session
     
     # If session_id provided, try to load from DB
     if session_id:
-        db_session = await db_handler.get_session_by_session_id(session_id)
+        # Session row and full history arrive in one round trip
+        db_session, history = await db_handler.get_session_with_messages(session_id)
         if db_session:
             # Reconstruct session from DB
             session = ConversationSession(
                 session_id=session_id,
-                session_db_id=db_session['id'],
+                session_db_id=db_session.id,
                 brand=brand,
-                brand_id=db_session['brand_id'],
-                user_id=db_session['user_id']
+                brand_id=db_session.brand_id,
+                user_id=db_session.user_id
             )
-            # Load messages from DB
-            messages = await db_handler.get_session_messages(db_session['id'])
-            for msg in messages:
+            for msg in history:
                 session.conversation_history.append({
-                    "role": msg['role'],
-                    "content": [{"type": "input_text" if msg['role'] == 'user' else "output_text", "text": msg['content']}]
+                    "role": msg.role,
+                    "content": [{"type": "input_text" if msg.role == 'user' else "output_text", "text": msg.content}]
                 })
-            
+
             active_sessions[session_id] = session
             return session
     
@@ -354,12 +413,15 @@ async def get_or_create_session(session_id: Optional[str] = None, brand: str = "
     # Get brand from DB
     brand_data = await db_handler.get_brand_by_key(brand)
     if brand_data:
-        new_session.brand_id = brand_data['id']
+        new_session.brand_id = brand_data.id
     
-    # Create session in DB (non-blocking for speed)
+    # Create session in DB with the user already attached when known,
+    # so no follow-up UPDATE is needed
+    new_session.user_id = user_id
     session_db_id = await db_handler.create_session(
-        new_session.session_id, 
-        new_session.brand_id if new_session.brand_id else 1
+        new_session.session_id,
+        new_session.brand_id if new_session.brand_id else 1,
+        user_id
     )
     new_session.session_db_id = session_db_id
     
@@ -367,22 +429,57 @@ async def get_or_create_session(session_id: Optional[str] = None, brand: str = "
     return new_session
 
 
+# Compiled once at import; these run on every message/request, and
+# going through re.match/re.sub pays the pattern-cache lookup and
+# argument parsing on each call
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_NONDIGIT_RE = re.compile(r'\D')
+_PHONE_RE = re.compile(r'(?:\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4,5}')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_OL_ITEM_RE = re.compile(r'^\d+\.\s')
+# Scrubbing alternations: one pass and one result string per text
+# instead of a full walk + intermediate allocation per pattern. DOTALL
+# is scoped inline to the SYSTEM NOTE branch, matching the flags the
+# individual patterns used.
+_EMAIL_SCRUB_RE = re.compile(
+    r'(\[SYSTEM NOTE:(?s:.*?)\])'
+    r'|(\[.*?uploaded file:.*?\])'
+    r'|(【[^】]*?†source】)'
+    r'|(【\d+:[^】]*】)',
+    re.IGNORECASE,
+)
+_RESPONSE_SCRUB_RE = re.compile(
+    r'(?:\[SYSTEM NOTE:(?s:.*?)\])'
+    r'|(?:\[.*?transfer.*?\])'
+    r'|(?:【[^】]*?†source】)'
+    r'|(?:【\d+:[^】]*】)',
+    re.IGNORECASE,
+)
+
+
+def _email_scrub(match: re.Match) -> str:
+    """Replacement dispatch for _EMAIL_SCRUB_RE
+
+    Upload markers become a visible placeholder; everything else is
+    dropped.
+    """
+    return '📎 Uploaded a file' if match.group(2) else ''
+
+
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return bool(_EMAIL_RE.match(email))
 
 
 def validate_phone(phone: str) -> bool:
     """Validate phone number format"""
-    digits = re.sub(r'\D', '', phone)
+    digits = _NONDIGIT_RE.sub('', phone)
     return 10 <= len(digits) <= 15
 
 
 def extract_phone_from_message(message: str, session: ConversationSession):
     """Extract phone number from user message"""
-    phone_pattern = r'(?:\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4,5}'
-    phone_matches = re.findall(phone_pattern, message)
+    phone_matches = _PHONE_RE.findall(message)
     if phone_matches:
         for phone_raw in phone_matches:
             if validate_phone(phone_raw):
@@ -390,48 +487,55 @@ def extract_phone_from_message(message: str, session: ConversationSession):
                 break
 
 
+@lru_cache(maxsize=2048)
 def format_markdown_to_html(text: str) -> str:
-    """Convert markdown formatting to HTML for display"""
-    text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', text)
-    
+    """Convert markdown formatting to HTML for display
+
+    Pure str -> str, so results are LRU-cached: the same assistant
+    message gets re-rendered when an email send is retried, and long
+    transcripts repeat boilerplate lines.
+    """
+    text = _BOLD_RE.sub(r'<strong>\1</strong>', text)
+
     lines = text.split('\n')
     formatted_lines = []
+    append = formatted_lines.append
     in_list = False
     list_type = None
-    
+
     for line in lines:
         stripped = line.strip()
         
         if stripped.startswith('- ') or stripped.startswith('* '):
             if not in_list or list_type != 'ul':
                 if in_list:
-                    formatted_lines.append(f'</{list_type}>')
-                formatted_lines.append('<ul>')
+                    append(f'</{list_type}>')
+                append('<ul>')
                 in_list = True
                 list_type = 'ul'
-            formatted_lines.append(f'<li>{stripped[2:]}</li>')
-        elif re.match(r'^\d+\.\s', stripped):
+            append(f'<li>{stripped[2:]}</li>')
+        elif _OL_ITEM_RE.match(stripped):
             if not in_list or list_type != 'ol':
                 if in_list:
-                    formatted_lines.append(f'</{list_type}>')
-                formatted_lines.append('<ol>')
+                    append(f'</{list_type}>')
+                append('<ol>')
                 in_list = True
                 list_type = 'ol'
-            clean_text = re.sub(r'^\d+\.\s', '', stripped)
-            formatted_lines.append(f'<li>{clean_text}</li>')
+            clean_text = _OL_ITEM_RE.sub('', stripped)
+            append(f'<li>{clean_text}</li>')
         else:
             if in_list:
-                formatted_lines.append(f'</{list_type}>')
+                append(f'</{list_type}>')
                 in_list = False
                 list_type = None
             
             if stripped:
-                formatted_lines.append(f'<p>{stripped}</p>')
+                append(f'<p>{stripped}</p>')
             else:
-                formatted_lines.append('<br>')
+                append('<br>')
     
     if in_list:
-        formatted_lines.append(f'</{list_type}>')
+        append(f'</{list_type}>')
     
     return '\n'.join(formatted_lines)
 
@@ -453,24 +557,36 @@ async def send_conversation_email(session: ConversationSession) -> bool:
     if session.email_sent:
         print(f"Email already sent for session {session.session_id}")
         return True
-    
+
+    # Nothing to say and nobody to say it to are both cheap to detect;
+    # bail before paying for transcript formatting and template render
+    if not session.conversation_history:
+        print(f"⚠️ No conversation history for session {session.session_id}, skipping email")
+        return False
+
     brand = session.brand
     brand_display = BRAND_NAMES.get(brand, brand.upper())
-    
+
     # Get recipients from DB
     if session.brand_id:
         recipients_list = await db_handler.get_brand_recipients(session.brand_id)
     else:
         recipients_list = ["barishwlts@gmail.com"]
-    
+
+    if not recipients_list:
+        print(f"⚠️ No active recipients for brand {brand_display}, skipping email")
+        return False
+
     print(f"📧 Preparing email for {brand_display} session {session.session_id}")
     print(f"   Total conversation items: {len(session.conversation_history)}")
     
-    # Format conversation history
-    conversation_html = ""
-    message_count = 0
-    
-    for idx, msg in enumerate(session.conversation_history):
+    # Format conversation history, tallying roles in the same pass
+    # instead of re-walking the history per count afterwards
+    messages = []
+    user_messages = 0
+    assistant_messages = 0
+
+    for msg in session.conversation_history:
         role = msg.get("role", "unknown")
         content = msg.get("content", "")
         
@@ -491,213 +607,99 @@ async def send_conversation_email(session: ConversationSession) -> bool:
         if not text_content:
             continue
         
-        display_text = re.sub(r'\[SYSTEM NOTE:.*?\]', '', text_content, flags=re.IGNORECASE | re.DOTALL).strip()
-        display_text = re.sub(r'\[.*?uploaded file:.*?\]', '📎 Uploaded a file', display_text, flags=re.IGNORECASE).strip()
-        display_text = re.sub(r'【[^】]*?†source】', '', display_text)
-        display_text = re.sub(r'【\d+:[^】]*】', '', display_text)
+        display_text = _EMAIL_SCRUB_RE.sub(_email_scrub, text_content).strip()
         
         if not display_text:
             continue
         
         if role == "user":
-            conversation_html += f"""
-            <div style="margin: 15px 0; padding: 12px; background: #f0f0f0; border-radius: 8px; border-left: 4px solid #667eea;">
-                <div style="font-weight: bold; color: #667eea; margin-bottom: 5px;">User:</div>
-                <div style="color: #333; white-space: pre-wrap;">{display_text}</div>
-            </div>
-            """
-            message_count += 1
-            
+            messages.append({'role': 'user', 'text': display_text})
+            user_messages += 1
         elif role == "assistant":
-            formatted_content = format_markdown_to_html(display_text)
-            conversation_html += f"""
-            <div style="margin: 15px 0; padding: 12px; background: #ffffff; border-radius: 8px; border-left: 4px solid #4CAF50; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
-                <div style="font-weight: bold; color: #4CAF50; margin-bottom: 5px;">Assistant:</div>
-                <div style="color: #333; line-height: 1.6;">{formatted_content}</div>
-            </div>
-            """
-            message_count += 1
-    
-    print(f"   Formatted {message_count} messages for email")
-    
-    if not conversation_html:
-        conversation_html = "<div style='color: #999; padding: 20px; text-align: center;'>⚠️ No conversation data available</div>"
-    
-    # Build user info section
-    user_info = session.user_context.model_dump()
-    user_info_html = ""
-    
-    for key, value in user_info.items():
-        if value:
-            label = key.replace('_', ' ').title()
-            user_info_html += f"<div style='margin: 8px 0;'><strong>{label}:</strong> {value}</div>"
-    
+            messages.append({'role': 'assistant',
+                             'html': format_markdown_to_html(display_text)})
+            assistant_messages += 1
+
+    print(f"   Formatted {len(messages)} messages for email")
+
+    # Contact info rows; the template autoescapes the values
+    user_info = [
+        (key.replace('_', ' ').title(), value)
+        for key, value in session.user_context.model_dump().items()
+        if value
+    ]
+
     # Location info
     location_str = "Unknown"
     if session.user_location:
         location_data = session.user_location.model_dump()
         if location_data.get('city') or location_data.get('country'):
             location_str = f"{location_data.get('city', 'Unknown')}, {location_data.get('region', 'Unknown')}, {location_data.get('country', 'Unknown')}"
-            user_info_html += f"<div style='margin: 8px 0;'><strong>Location:</strong> {location_str}</div>"
+            user_info.append(('Location', location_str))
             if location_data.get('ip'):
-                user_info_html += f"<div style='margin: 8px 0;'><strong>IP Address:</strong> {location_data.get('ip')}</div>"
-    
-    if not user_info_html:
-        user_info_html = "<div style='color: #999;'>No contact information collected</div>"
-    
+                user_info.append(('IP Address', location_data.get('ip')))
+
     # Session details
     created_ist = get_ist_time(session.created_at)
     last_activity_ist = get_ist_time(session.last_activity)
     duration_minutes = (session.last_activity - session.created_at).seconds // 60
-    
-    user_messages = len([m for m in session.conversation_history if m.get('role') == 'user'])
-    assistant_messages = len([m for m in session.conversation_history if m.get('role') == 'assistant'])
-    
-    session_details = f"""
-    <div class="meta">
-        <strong>Brand:</strong> {brand_display}<br>
-        <strong>Session ID:</strong> {session.session_id}<br>
-        <strong>Model Used:</strong> {session.model_name}<br>
-        <strong>Started:</strong> {created_ist}<br>
-        <strong>Last Activity:</strong> {last_activity_ist}<br>
-        <strong>Duration:</strong> {duration_minutes} minutes<br>
-        <strong>User Messages:</strong> {user_messages}<br>
-        <strong>Assistant Responses:</strong> {assistant_messages}<br>
-        <strong>Last Input Tokens:</strong> {session.last_input_tokens}<br>
-        <strong>Last Output Tokens:</strong> {session.last_output_tokens}<br>
-        <strong>Last Total Tokens:</strong> {session.last_token_usage}<br>
-        <strong>Total Input Tokens:</strong> {session.total_input_tokens}<br>
-        <strong>Total Output Tokens:</strong> {session.total_output_tokens}<br>
-        <strong>Grand Total Tokens:</strong> {session.total_input_tokens + session.total_output_tokens}<br>
-        <hr style="margin: 10px 0; border: none; border-top: 1px solid #ddd;">
-        <strong style="color: #28a745;">Cost Breakdown:</strong><br>
-        <strong>Input Cost:</strong> ${session.total_input_cost:.6f}<br>
-        <strong>Output Cost:</strong> ${session.total_output_cost:.6f}<br>
-        <strong style="color: #28a745;">Total Session Cost:</strong> <span style="font-size: 1.1em;">${session.total_cost:.6f}</span>
-    </div>
-    """
-    
-    # Email HTML content
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ 
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Arial, sans-serif;
-                line-height: 1.6; 
-                color: #333;
-                background: #f5f5f5;
-                margin: 0;
-                padding: 0;
-            }}
-            .container {{
-                max-width: 800px;
-                margin: 0 auto;
-                background: white;
-                padding: 0;
-            }}
-            .header {{ 
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white; 
-                padding: 30px; 
-                text-align: center;
-            }}
-            .header h2 {{
-                margin: 0;
-                font-size: 24px;
-                font-weight: 600;
-            }}
-            .section {{ 
-                padding: 25px;
-                border-bottom: 1px solid #e0e0e0;
-            }}
-            .section h3 {{ 
-                color: #667eea;
-                margin: 0 0 15px 0;
-                font-size: 18px;
-                font-weight: 600;
-            }}
-            .meta {{ 
-                color: #666; 
-                font-size: 14px;
-                line-height: 1.8;
-            }}
-            .conversation {{
-                padding: 25px;
-                background: #fafafa;
-            }}
-            .footer {{
-                padding: 20px;
-                text-align: center;
-                color: #999;
-                font-size: 12px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h2>New Lead from {brand_display} Chatbot</h2>
-            </div>
-            
-            <div class="section">
-                <h3>Contact Information</h3>
-                {user_info_html}
-            </div>
-            
-            <div class="section">
-                <h3>Session Details</h3>
-                {session_details}
-            </div>
-            
-            <div class="conversation">
-                <h3 style="color: #667eea; margin: 0 0 20px 0;">Conversation Transcript</h3>
-                {conversation_html}
-            </div>
-            
-            <div class="footer">
-                {brand_display} - Automated Chatbot System<br>
-                Generated on {get_ist_time(datetime.now())}
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    # Create email message
+
+    # Compiled once into Jinja's template cache; rendering runs
+    # template bytecode instead of re-parsing a ~4 KB f-string per
+    # email, and autoescape closes the hole where raw user text was
+    # interpolated straight into the HTML
+    html_content = templates.get_template("email_transcript.html").render(
+        brand_display=brand_display,
+        session=session,
+        messages=messages,
+        user_info=user_info,
+        created_ist=created_ist,
+        last_activity_ist=last_activity_ist,
+        duration_minutes=duration_minutes,
+        user_messages=user_messages,
+        assistant_messages=assistant_messages,
+        generated_at=get_ist_time(datetime.now()),
+    )
+
+    # Create email message; the modern EmailMessage API folds headers
+    # and flattens the body through the compiled SMTP policy rather
+    # than the legacy email.mime Python-level path. Built once — a
+    # retry reuses the same message.
     subject = f"New Lead From {brand_display} Chatbot: {session.user_context.name or 'Anonymous'} - {location_str}"
-    
+
+    msg = EmailMessage(policy=SMTP_POLICY)
+    msg['Subject'] = subject
+    msg['From'] = f"{brand_display} {SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
+    msg['To'] = ", ".join(recipients_list)
+    msg.set_content("See the HTML version of this email for the transcript.")
+    msg.add_alternative(html_content, subtype='html')
+
     # Retry logic
     max_retries = 3
     retry_delay = 2
-    
+
     for attempt in range(max_retries):
         try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{brand_display} {SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-            msg['To'] = ", ".join(recipients_list)
-            
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-            
-            print(f"📤 Connecting to SMTP server: {SMTP_HOST}:{SMTP_PORT}")
-            
-            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=15)
-            
-            print(f"🔐 Logging in as: {SMTP_USERNAME}")
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            
-            print(f"📬 Sending email to: {', '.join(recipients_list)}")
-            server.send_message(msg)
-            server.quit()
-            
+            print(f"📬 Sending email via {SMTP_HOST}:{SMTP_PORT} to: {', '.join(recipients_list)}")
+
+            # Async SMTP: the TLS handshake + login + send happen off
+            # the event loop's back, so concurrent requests keep being
+            # served instead of stalling for the round trips
+            await aiosmtplib.send(
+                msg,
+                hostname=SMTP_HOST,
+                port=SMTP_PORT,
+                username=SMTP_USERNAME,
+                password=SMTP_PASSWORD,
+                use_tls=True,
+                timeout=15,
+            )
+
             session.email_sent = True
             
             # Log email in DB (non-blocking)
             if session.session_db_id and session.brand_id:
-                await db_handler.log_email_send(
+                db_handler.log_email_send(
                     session.session_db_id,
                     session.user_id,
                     session.brand_id,
@@ -710,11 +712,11 @@ async def send_conversation_email(session: ConversationSession) -> bool:
             print(f"✅ Email sent successfully for {brand_display} session {session.session_id} (attempt {attempt + 1})")
             return True
         
-        except smtplib.SMTPAuthenticationError as e:
+        except aiosmtplib.SMTPAuthenticationError as e:
             print(f"❌ SMTP Authentication failed: {e}")
             break
-        
-        except smtplib.SMTPException as e:
+
+        except aiosmtplib.SMTPException as e:
             print(f"⚠️ SMTP error for session {session.session_id} (attempt {attempt + 1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
                 await asyncio.sleep(retry_delay)
@@ -736,18 +738,6 @@ def create_session_token():
     """Generate secure session token"""
     return secrets.token_urlsafe(32)
 
-def verify_session(request: Request):
-    """Verify user session from cookie"""
-    session_token = request.cookies.get("dashboard_session")
-    if not session_token or session_token not in ACTIVE_SESSIONS:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    session_data = ACTIVE_SESSIONS[session_token]
-    if datetime.now() > session_data["expires"]:
-        del ACTIVE_SESSIONS[session_token]
-        raise HTTPException(status_code=401, detail="Session expired")
-    
-    return session_data
 # ==================== FASTAPI APP LIFECYCLE ====================
 
 @asynccontextmanager
@@ -757,11 +747,16 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting Multi-Brand Chatbot System...")
     await db_pool.create_pool()
     print("✅ Database connection established")
-    
+    # Refresh daily analytics once per hour instead of per session end
+    analytics_task = asyncio.create_task(db_handler.analytics_loop())
+
     yield
-    
+
     # Shutdown
     print("🛑 Shutting down...")
+    analytics_task.cancel()
+    await db_handler.flush_activity()
+    await db_handler.writer.flush_pending()
     await db_pool.close_pool()
     print("✅ Database connections closed")
 
@@ -825,9 +820,27 @@ async def chat(chat_msg: ChatMessage):
         # Determine brand from request
         brand = chat_msg.brand or "gbpseo"
         
+        # Resolve the user before the session so a brand-new session row is
+        # created with its user_id already set (no follow-up UPDATE)
+        user_id = None
+        if chat_msg.user_info and chat_msg.user_info.get('email'):
+            email = chat_msg.user_info['email']
+            if validate_email(email):
+                location = chat_msg.user_location or {}
+                user_data = {
+                    'name': chat_msg.user_info.get('name'),
+                    'email': email,
+                    'phone': chat_msg.user_info.get('phone'),
+                    'ip_address': location.get('ip'),
+                    'city': location.get('city'),
+                    'region': location.get('region'),
+                    'country': location.get('country')
+                }
+                user_id = await db_handler.get_or_create_user(email, user_data)
+
         # Get or create session with brand
-        session = await get_or_create_session(chat_msg.session_id, brand)
-        
+        session = await get_or_create_session(chat_msg.session_id, brand, user_id)
+
         # Store user info from frontend
         if chat_msg.user_info:
             if chat_msg.user_info.get('name'):
@@ -835,24 +848,14 @@ async def chat(chat_msg: ChatMessage):
             if chat_msg.user_info.get('email'):
                 email = chat_msg.user_info['email']
                 session.user_context.email = email
-                
-                # Create or update user in DB (non-blocking)
-                if validate_email(email):
-                    user_data = {
-                        'name': session.user_context.name,
-                        'email': email,
-                        'phone': session.user_context.phone,
-                        'ip_address': session.user_location.ip,
-                        'city': session.user_location.city,
-                        'region': session.user_location.region,
-                        'country': session.user_location.country
-                    }
-                    user_id = await db_handler.get_or_create_user(email, user_data)
+
+                if user_id and session.user_id != user_id:
                     session.user_id = user_id
-                    
-                    # Update session with user_id in DB
+
+                    # Sessions created before the user identified themselves
+                    # still need their row pointed at the user
                     if session.session_db_id:
-                        asyncio.create_task(db_handler._update_session_user_task(session.session_db_id, user_id))
+                        asyncio.create_task(db_handler.update_session_user(session.session_db_id, user_id))
             
             if chat_msg.user_info.get('phone'):
                 session.user_context.phone = chat_msg.user_info['phone']
@@ -928,10 +931,7 @@ async def chat(chat_msg: ChatMessage):
                                     response_text += item.content + " "
                 
                 response_text = response_text.strip()
-                response_text = re.sub(r'\[SYSTEM NOTE:.*?\]', '', response_text, flags=re.IGNORECASE | re.DOTALL)
-                response_text = re.sub(r'\[.*?transfer.*?\]', '', response_text, flags=re.IGNORECASE)
-                response_text = re.sub(r'【[^】]*?†source】', '', response_text)
-                response_text = re.sub(r'【\d+:[^】]*】', '', response_text)
+                response_text = _RESPONSE_SCRUB_RE.sub('', response_text)
                 response_text = response_text.strip()
                 
                 print(f"🔍 Response extraction (attempt {attempt + 1}):")
@@ -983,26 +983,19 @@ async def chat(chat_msg: ChatMessage):
                     session.last_input_tokens = input_tokens
                     session.last_output_tokens = output_tokens
                     session.last_token_usage = token_usage
-                    session.last_input_cost = float(input_cost)
-                    session.last_output_cost = float(output_cost)
-                    session.last_total_cost = float(total_cost)
+                    session.last_input_cost = input_cost
+                    session.last_output_cost = output_cost
+                    session.last_total_cost = total_cost
                     
                     # Update cumulative totals
                     session.total_input_tokens += input_tokens
                     session.total_output_tokens += output_tokens
-                    session.total_input_cost += float(input_cost)
-                    session.total_output_cost += float(output_cost)
-                    session.total_cost += float(total_cost)
-                    
-                    # ✅ UPDATE TOKENS WITH COST IN DB
-                    await db_handler.update_session_tokens_with_cost(
-                        session.session_id,
-                        input_tokens,
-                        output_tokens,
-                        token_usage,
-                        session.model_name
-                    )
+                    session.total_input_cost += input_cost
+                    session.total_output_cost += output_cost
+                    session.total_cost += total_cost
                     
+                    # Session token totals and costs are folded into the
+                    # add_message_with_cost session UPDATE below
                 except Exception as token_error:
                     print(f"⚠️ Error extracting tokens/costs: {token_error}")
                     token_usage = 0
@@ -1149,7 +1142,7 @@ async def upload_file(
     
     # Save file upload to DB (non-blocking)
     if session.session_db_id:
-        await db_handler.add_message(
+        db_handler.add_message(
             session.session_db_id,
             "user",
             f"[User uploaded file: {file.filename}]",
@@ -1231,25 +1224,19 @@ async def end_session(request: Request):
         print(f"📧 Attempting to send email for session {session_id}...")
         email_sent = await send_conversation_email(session)
         
-        # Mark session as ended in DB
-        await db_handler.end_session(session.session_id, email_sent)
-        
-        # Update user-brand interaction stats WITH COST
-        if session.user_id and session.brand_id:
-            await db_handler.update_user_brand_interaction_with_cost(
-                session.user_id,
-                session.brand_id,
-                len(session.conversation_history),
-                email_sent,
-                session.total_input_tokens,
-                session.total_output_tokens,
-                session.model_name
-            )
-        
-        # Update daily analytics WITH COST
-        if session.brand_id:
-            await db_handler.update_daily_analytics_with_cost(session.brand_id)
-        
+        # Mark session as ended and record interaction stats in one round-trip
+        await db_handler.finalize_session(
+            session.session_id,
+            session.user_id,
+            session.brand_id,
+            email_sent,
+            len(session.conversation_history),
+            session.total_input_tokens,
+            session.total_output_tokens,
+            session.model_name
+        )
+
+        # Daily analytics are refreshed by the periodic aggregator, not here
         if email_sent:
             print(f"✅ Email sent successfully for session {session_id}")
         else:
@@ -1288,19 +1275,19 @@ async def get_session(session_id: str):
             raise HTTPException(status_code=404, detail="Session not found")
         
         return JSONResponse({
-            "session_id": db_session['session_id'],
-            "brand_id": db_session['brand_id'],
-            "user_id": db_session['user_id'],
-            "status": db_session['status'],
-            "message_count": db_session['message_count'],
-            "created_at": db_session['started_at'].isoformat(),
-            "email_sent": db_session['email_sent'],
-            "last_input_tokens": db_session['last_input_tokens'],
-            "last_output_tokens": db_session['last_output_tokens'],
-            "last_token_usage": db_session['last_token_usage'],
-            "total_input_tokens": db_session['total_input_tokens'],
-            "total_output_tokens": db_session['total_output_tokens'],
-            "total_tokens": db_session['total_tokens'],
+            "session_id": db_session.session_id,
+            "brand_id": db_session.brand_id,
+            "user_id": db_session.user_id,
+            "status": db_session.status,
+            "message_count": db_session.message_count,
+            "created_at": db_session.started_at.isoformat(),
+            "email_sent": db_session.email_sent,
+            "last_input_tokens": db_session.last_input_tokens,
+            "last_output_tokens": db_session.last_output_tokens,
+            "last_token_usage": db_session.last_token_usage,
+            "total_input_tokens": db_session.total_input_tokens,
+            "total_output_tokens": db_session.total_output_tokens,
+            "total_tokens": db_session.total_tokens,
             "last_input_cost": session.last_input_cost,
             "last_output_cost": session.last_output_cost,
             "last_total_cost": session.last_total_cost,
@@ -1339,8 +1326,13 @@ def convert_decimal(obj):
         return [convert_decimal(i) for i in obj]
     return obj
 
-def verify_session(request: Request):
-    """Verify user session from cookie - Redirect to login if unauthorized"""
+async def verify_session(request: Request):
+    """Verify user session from cookie - Redirect to login if unauthorized
+
+    Declared async even though it never awaits: FastAPI runs sync
+    dependencies in the threadpool, so the sync version paid a thread
+    hop on every dashboard request for what is a dict lookup.
+    """
     session_token = request.cookies.get("dashboard_session")
     
     # If no session token or invalid, redirect to login
@@ -1400,7 +1392,7 @@ async def get_dashboard_stats(brand_key: Optional[str] = None):
     if brand_key:
         brand_data = await db_handler.get_brand_by_key(brand_key)
         if brand_data:
-            brand_id = brand_data['id']
+            brand_id = brand_data.id
     
     stats = await db_handler.get_dashboard_stats(brand_id)
     stats = convert_decimal(stats)
@@ -1461,140 +1453,166 @@ async def logout(request: Request):
     response.delete_cookie("dashboard_session")
     return response
 
+async def fetch_one(query: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
+    """Run a single-row query on its own pooled connection"""
+    async with db_pool.get_read_connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchone()
+
+
+async def fetch_all(query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    """Run a multi-row query on its own pooled connection"""
+    async with db_pool.get_read_connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+
+
 @app.get("/admin/dashboard", response_class=HTMLResponse)
 async def dashboard_page(request: Request, session: dict = Depends(verify_session)):
     """Render main dashboard with cost tracking"""
     try:
-        # Get all brands
+        # Get all brands (per-brand session/user counts come from the
+        # single-pass get_dashboard_stats_bulk below)
         brands_query = """
-            SELECT id, brand_key, brand_display_name, is_active,
-                   (SELECT COUNT(*) FROM sessions WHERE brand_id = brands.id) as total_sessions,
-                   (SELECT COUNT(DISTINCT user_id) FROM sessions WHERE brand_id = brands.id) as total_users
+            SELECT id, brand_key, brand_display_name, is_active
             FROM brands
             ORDER BY brand_display_name
         """
-        
-        async with db_pool.get_connection() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                # Get brands
-                await cursor.execute(brands_query)
-                brands = await cursor.fetchall()
-                
-                # Get overall stats WITH COST - UPDATED
-                await cursor.execute("""
-                    SELECT 
-                        COUNT(DISTINCT s.id) as total_sessions,
-                        COUNT(DISTINCT s.user_id) as total_users,
-                        SUM(s.message_count) as total_messages,
-                        SUM(s.email_sent) as total_emails,
-                        AVG(s.duration_seconds) as avg_duration,
-                        SUM(s.total_tokens) as total_tokens,
-                        SUM(s.input_cost) as total_input_cost,
-                        SUM(s.output_cost) as total_output_cost,
-                        SUM(s.total_cost) as total_cost,
-                        AVG(s.total_cost) as avg_cost_per_session,
-                        MAX(s.total_cost) as max_cost,
-                        MIN(s.total_cost) as min_cost,
-                        COUNT(DISTINCT DATE(s.started_at)) as active_days
-                    FROM sessions s
-                """)
-                overall_stats = await cursor.fetchone()
-                
-                # Get today's stats WITH COST - UPDATED
-                await cursor.execute("""
-                    SELECT 
-                        COUNT(DISTINCT id) as sessions_today,
-                        COUNT(DISTINCT user_id) as users_today,
-                        SUM(message_count) as messages_today,
-                        SUM(email_sent) as emails_today,
-                        SUM(total_cost) as cost_today,
-                        SUM(input_cost) as input_cost_today,
-                        SUM(output_cost) as output_cost_today
-                    FROM sessions
-                    WHERE DATE(started_at) = CURDATE()
-                """)
-                today_stats = await cursor.fetchone()
-                
-                # Get recent sessions WITH COST - UPDATED
-                await cursor.execute("""
-                    SELECT 
-                        s.session_id,
-                        s.started_at,
-                        s.message_count,
-                        s.status,
-                        s.email_sent,
-                        s.total_tokens,
-                        s.model_name,
-                        s.input_cost,
-                        s.output_cost,
-                        s.total_cost,
-                        b.brand_display_name,
-                        u.email as user_email,
-                        u.name as user_name
-                    FROM sessions s
-                    LEFT JOIN brands b ON s.brand_id = b.id
-                    LEFT JOIN users u ON s.user_id = u.id
-                    ORDER BY s.started_at DESC
-                    LIMIT 20
-                """)
-                recent_sessions = await cursor.fetchall()
-                
-                # Get top users WITH COST - UPDATED
-                await cursor.execute("""
-                    SELECT
-                        u.id, 
-                        u.email,
-                        u.name,
-                        u.total_conversations,
-                        u.last_seen,
-                        COUNT(DISTINCT s.id) as session_count,
-                        SUM(s.message_count) as total_messages,
-                        SUM(s.total_cost) as total_cost
-                    FROM users u
-                    LEFT JOIN sessions s ON u.id = s.user_id
-                    GROUP BY u.id
-                    ORDER BY u.total_conversations DESC
-                    LIMIT 10
-                """)
-                top_users = await cursor.fetchall()
-                
-                # Get all users WITH COST - UPDATED
-                await cursor.execute("""
-                    SELECT
-                        u.id, 
-                        u.email,
-                        u.name,
-                        u.total_conversations,
-                        u.last_seen,
-                        COUNT(DISTINCT s.id) as session_count,
-                        SUM(s.message_count) as total_messages,
-                        SUM(s.total_cost) as total_cost,
-                        SUM(s.input_cost) as total_input_cost,
-                        SUM(s.output_cost) as total_output_cost
-                    FROM users u
-                    LEFT JOIN sessions s ON u.id = s.user_id
-                    GROUP BY u.id
-                    ORDER BY u.total_conversations DESC
-                """)
-                all_users = await cursor.fetchall()
 
-                # Get daily stats for last 7 days WITH COST - UPDATED
-                await cursor.execute("""
-                    SELECT 
-                        DATE(started_at) as date,
-                        COUNT(DISTINCT id) as sessions,
-                        COUNT(DISTINCT user_id) as users,
-                        SUM(message_count) as messages,
-                        SUM(email_sent) as emails,
-                        SUM(total_cost) as total_cost,
-                        AVG(total_cost) as avg_cost
-                    FROM sessions
-                    WHERE started_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-                    GROUP BY DATE(started_at)
-                    ORDER BY date DESC
-                """)
-                daily_stats = await cursor.fetchall()
-        
+        # Overall stats WITH COST - UPDATED
+        overall_query = """
+            SELECT
+                COUNT(DISTINCT s.id) as total_sessions,
+                COUNT(DISTINCT s.user_id) as total_users,
+                SUM(s.message_count) as total_messages,
+                SUM(s.email_sent) as total_emails,
+                AVG(s.duration_seconds) as avg_duration,
+                SUM(s.total_tokens) as total_tokens,
+                SUM(s.input_cost) as total_input_cost,
+                SUM(s.output_cost) as total_output_cost,
+                SUM(s.total_cost) as total_cost,
+                AVG(s.total_cost) as avg_cost_per_session,
+                MAX(s.total_cost) as max_cost,
+                MIN(s.total_cost) as min_cost,
+                COUNT(DISTINCT DATE(s.started_at)) as active_days
+            FROM sessions s
+        """
+
+        # Today's stats WITH COST - UPDATED
+        today_query = """
+            SELECT
+                COUNT(DISTINCT id) as sessions_today,
+                COUNT(DISTINCT user_id) as users_today,
+                SUM(message_count) as messages_today,
+                SUM(email_sent) as emails_today,
+                SUM(total_cost) as cost_today,
+                SUM(input_cost) as input_cost_today,
+                SUM(output_cost) as output_cost_today
+            FROM sessions
+            WHERE DATE(started_at) = CURDATE()
+        """
+
+        # Recent sessions WITH COST - UPDATED
+        recent_query = """
+            SELECT
+                s.session_id,
+                s.started_at,
+                s.message_count,
+                s.status,
+                s.email_sent,
+                s.total_tokens,
+                s.model_name,
+                s.input_cost,
+                s.output_cost,
+                s.total_cost,
+                b.brand_display_name,
+                u.email as user_email,
+                u.name as user_name
+            FROM sessions s
+            LEFT JOIN brands b ON s.brand_id = b.id
+            LEFT JOIN users u ON s.user_id = u.id
+            ORDER BY s.started_at DESC
+            LIMIT 20
+        """
+
+        # Top users WITH COST - UPDATED
+        top_users_query = """
+            SELECT
+                u.id,
+                u.email,
+                u.name,
+                u.total_conversations,
+                u.last_seen,
+                COUNT(DISTINCT s.id) as session_count,
+                SUM(s.message_count) as total_messages,
+                SUM(s.total_cost) as total_cost
+            FROM users u
+            LEFT JOIN sessions s ON u.id = s.user_id
+            GROUP BY u.id
+            ORDER BY u.total_conversations DESC
+            LIMIT 10
+        """
+
+        # All users WITH COST - UPDATED
+        all_users_query = """
+            SELECT
+                u.id,
+                u.email,
+                u.name,
+                u.total_conversations,
+                u.last_seen,
+                COUNT(DISTINCT s.id) as session_count,
+                SUM(s.message_count) as total_messages,
+                SUM(s.total_cost) as total_cost,
+                SUM(s.input_cost) as total_input_cost,
+                SUM(s.output_cost) as total_output_cost
+            FROM users u
+            LEFT JOIN sessions s ON u.id = s.user_id
+            GROUP BY u.id
+            ORDER BY u.total_conversations DESC
+        """
+
+        # Daily stats for last 7 days WITH COST - UPDATED
+        daily_query = """
+            SELECT
+                DATE(started_at) as date,
+                COUNT(DISTINCT id) as sessions,
+                COUNT(DISTINCT user_id) as users,
+                SUM(message_count) as messages,
+                SUM(email_sent) as emails,
+                SUM(total_cost) as total_cost,
+                AVG(total_cost) as avg_cost
+            FROM sessions
+            WHERE started_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+            GROUP BY DATE(started_at)
+            ORDER BY date DESC
+        """
+
+        # The queries are independent, so overlap their round-trips by
+        # running each on its own pooled connection
+        (
+            brands, brand_stats, overall_stats, today_stats,
+            recent_sessions, top_users, all_users, daily_stats
+        ) = await asyncio.gather(
+            fetch_all(brands_query),
+            db_handler.get_dashboard_stats_bulk(),
+            fetch_one(overall_query),
+            fetch_one(today_query),
+            fetch_all(recent_query),
+            fetch_all(top_users_query),
+            fetch_all(all_users_query),
+            fetch_all(daily_query)
+        )
+
+        # One GROUP BY scan over sessions instead of a correlated
+        # subquery pair per brand
+        for brand in brands:
+            stats = brand_stats.get(brand['id'])
+            brand['total_sessions'] = stats['total_sessions'] if stats else 0
+            brand['total_users'] = stats['total_users'] if stats else 0
+
         return templates.TemplateResponse("dashboard.html", {
             "request": request,
             "username": session["username"],
@@ -1618,7 +1636,7 @@ async def dashboard_page(request: Request, session: dict = Depends(verify_sessio
 async def get_brand_stats(brand_id: int, session: dict = Depends(verify_session)):
     """Get detailed stats for specific brand"""
     try:
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT 
@@ -1640,7 +1658,7 @@ async def get_brand_stats(brand_id: int, session: dict = Depends(verify_session)
 async def get_session_details(session_id: str, session: dict = Depends(verify_session)):
     """Get detailed conversation for a session"""
     try:
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 # Get session info
                 await cursor.execute("""
@@ -1672,7 +1690,7 @@ async def get_session_details(session_id: str, session: dict = Depends(verify_se
 async def brand_detail_page(request: Request, brand_id: int, session: dict = Depends(verify_session)):
     """Detailed brand analytics page"""
     try:
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 # Get brand info WITH COST - FIXED
                 await cursor.execute("""
@@ -1819,7 +1837,7 @@ async def brand_detail_page(request: Request, brand_id: int, session: dict = Dep
 async def user_detail_page(request: Request, user_id: int, session: dict = Depends(verify_session)):
     """Detailed user analytics page"""
     try:
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 # Get user info WITH COST - FIXED
                 await cursor.execute("""
@@ -1935,11 +1953,21 @@ async def user_detail_page(request: Request, user_id: int, session: dict = Depen
 
 # ==================== EMAIL LOGS PAGE ====================
 
+def parse_recipient_emails(value) -> list:
+    """Decode a recipient_emails JSON column (CSV fallback for old rows)"""
+    if not value:
+        return []
+    try:
+        return json.loads(value)
+    except (ValueError, TypeError):
+        return [e.strip() for e in str(value).split(',') if e.strip()]
+
+
 @app.get("/admin/emails", response_class=HTMLResponse)
 async def emails_page(request: Request, session: dict = Depends(verify_session)):
     """Email logs listing page"""
     try:
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 # Get all emails
                 await cursor.execute("""
@@ -1956,7 +1984,10 @@ async def emails_page(request: Request, session: dict = Depends(verify_session))
                     LIMIT 100
                 """)
                 emails = await cursor.fetchall()
-                
+
+                for email in emails:
+                    email['recipient_emails'] = parse_recipient_emails(email['recipient_emails'])
+
                 # Get email stats
                 await cursor.execute("""
                     SELECT 
@@ -1997,7 +2028,7 @@ async def email_detail_page(request: Request, email_id: int, session: dict = Dep
     print("Session data:", session)
 
     try:
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT e.*,
@@ -2014,6 +2045,8 @@ async def email_detail_page(request: Request, email_id: int, session: dict = Dep
                 email = await cursor.fetchone()
                 if not email:
                     raise HTTPException(status_code=404, detail="Email not found")
+                email['recipient_emails'] = parse_recipient_emails(email['recipient_emails'])
+                email['html_content'] = decompress_html(email['html_content'])
         
         # Create breadcrumbs
         breadcrumbs = [
@@ -2040,7 +2073,7 @@ async def email_detail_page(request: Request, email_id: int, session: dict = Dep
 async def tokens_page(request: Request, session: dict = Depends(verify_session)):
     """Detailed token usage analytics"""
     try:
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 # Overall token stats WITH COST
                 await cursor.execute("""
@@ -2171,7 +2204,7 @@ async def tokens_page(request: Request, session: dict = Depends(verify_session))
 async def recipients_page(request: Request, session: dict = Depends(verify_session)):
     """Recipients listing page grouped by brand"""
     try:
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 # Get all active brands
                 await cursor.execute("""
@@ -2269,7 +2302,9 @@ async def add_recipients(request: Request, session: dict = Depends(verify_sessio
                     added_count += 1
                 
                 await conn.commit()
-        
+
+        db_handler.invalidate_brand_cache()
+
         return JSONResponse({
             "success": True,
             "message": f"Successfully added {added_count} recipient(s)",
@@ -2301,7 +2336,9 @@ async def edit_recipient(recipient_id: int, request: Request, session: dict = De
                     WHERE id = %s
                 """, (email, name if name else None, is_active, recipient_id))
                 await conn.commit()
-        
+
+        db_handler.invalidate_brand_cache()
+
         return JSONResponse({
             "success": True,
             "message": "Recipient updated successfully"
@@ -2322,7 +2359,9 @@ async def delete_recipient(recipient_id: int, session: dict = Depends(verify_ses
                     DELETE FROM brand_recipients WHERE id = %s
                 """, (recipient_id,))
                 await conn.commit()
-        
+
+        db_handler.invalidate_brand_cache()
+
         return JSONResponse({
             "success": True,
             "message": "Recipient deleted successfully"
@@ -2345,7 +2384,9 @@ async def toggle_recipient_status(recipient_id: int, session: dict = Depends(ver
                     WHERE id = %s
                 """, (recipient_id,))
                 await conn.commit()
-        
+
+        db_handler.invalidate_brand_cache()
+
         return JSONResponse({
             "success": True,
             "message": "Recipient status toggled successfully"
@@ -2375,7 +2416,7 @@ async def costs_dashboard(request: Request, session: dict = Depends(verify_sessi
         logger.info(f"Daily trend data count: {len(daily_trend) if daily_trend else 0}")
         
         # Get all brands for filter
-        async with db_pool.get_connection() as conn:
+        async with db_pool.get_read_connection() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute("""
                     SELECT id, brand_key, brand_display_name 
@@ -2443,19 +2484,24 @@ async def export_costs(
         import csv
         from io import StringIO
         from fastapi.responses import StreamingResponse
-        
-        data = await db_handler.export_cost_report(brand_id, start_date, end_date)
-        
-        # Create CSV
-        output = StringIO()
-        writer = csv.DictWriter(output, fieldnames=data[0].keys() if data else [])
-        writer.writeheader()
-        writer.writerows(data)
-        
-        output.seek(0)
-        
+
+        # export_cost_report is an async generator; rows are encoded to
+        # CSV as they arrive so the response streams in constant memory
+        # instead of buffering the whole report
+        async def generate_csv():
+            output = StringIO()
+            writer = None
+            async for row in db_handler.export_cost_report(brand_id, start_date, end_date):
+                if writer is None:
+                    writer = csv.DictWriter(output, fieldnames=row.keys())
+                    writer.writeheader()
+                writer.writerow(row)
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+
         return StreamingResponse(
-            iter([output.getvalue()]),
+            generate_csv(),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename=cost_report_{datetime.now().strftime('%Y%m%d')}.csv"
@@ -7,7 +7,9 @@ USE chatbot_system;
 -- 1. BRANDS TABLE (Dynamic brand management)
 CREATE TABLE brands (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    brand_key VARCHAR(50) UNIQUE NOT NULL,
+    -- Binary collation: brand keys are exact-match lookups, so skip
+    -- case-folded comparisons in the index
+    brand_key VARCHAR(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin UNIQUE NOT NULL,
     brand_display_name VARCHAR(100) NOT NULL,
     brand_email VARCHAR(255),
     logo_url VARCHAR(255),
@@ -23,7 +25,8 @@ CREATE TABLE brands (
 -- 2. USERS TABLE (Centralized user management)
 CREATE TABLE users (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    email VARCHAR(255) UNIQUE NOT NULL,
+    -- Binary collation for exact-match index lookups
+    email VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin UNIQUE NOT NULL,
     name VARCHAR(255),
     phone VARCHAR(50),
     business_name VARCHAR(255),
@@ -36,6 +39,17 @@ CREATE TABLE users (
     first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     total_conversations INT DEFAULT 0,
+    -- Denormalized lifetime aggregates, maintained at session end, so a
+    -- user's cost summary is an O(1) row fetch rather than a JOIN+SUM
+    -- over every session they ever had
+    total_sessions INT DEFAULT 0,
+    total_input_tokens INT DEFAULT 0,
+    total_output_tokens INT DEFAULT 0,
+    total_tokens INT DEFAULT 0,
+    total_input_cost DECIMAL(12, 6) DEFAULT 0,
+    total_output_cost DECIMAL(12, 6) DEFAULT 0,
+    total_cost DECIMAL(12, 6) DEFAULT 0,
+    last_session_at TIMESTAMP NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_email (email),
@@ -46,20 +60,31 @@ CREATE TABLE users (
 -- 3. SESSIONS TABLE (Conversation sessions)
 CREATE TABLE sessions (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    session_id VARCHAR(100) UNIQUE NOT NULL,
+    -- Binary collation for exact-match index lookups
+    session_id VARCHAR(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin UNIQUE NOT NULL,
     user_id INT,
     brand_id INT NOT NULL,
     status ENUM('active', 'ended', 'timeout') DEFAULT 'active',
     started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Stored generated columns so date/hour filters and GROUP BYs stay
+    -- index-friendly instead of wrapping started_at in DATE()/HOUR()
+    started_date DATE AS (DATE(started_at)) STORED,
+    started_hour TINYINT AS (HOUR(started_at)) STORED,
     ended_at TIMESTAMP NULL,
     last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     duration_seconds INT DEFAULT 0,
     message_count INT DEFAULT 0,
+    next_message_order INT NOT NULL DEFAULT 1,
     user_message_count INT DEFAULT 0,
     assistant_message_count INT DEFAULT 0,
     email_sent BOOLEAN DEFAULT FALSE,
     email_sent_at TIMESTAMP NULL,
     contact_ask_count INT DEFAULT 0,
+    -- TRUE when this is the user's first session, set at creation (or
+    -- when the user is identified mid-session); the analytics rollup
+    -- counts new users with SUM(is_first_session) instead of joining
+    -- users to check first_seen
+    is_first_session BOOLEAN DEFAULT FALSE,
     total_input_tokens INT DEFAULT 0,
     total_output_tokens INT DEFAULT 0,
     total_tokens INT DEFAULT 0,
@@ -73,7 +98,23 @@ CREATE TABLE sessions (
     INDEX idx_session_id (session_id),
     INDEX idx_user_id (user_id),
     INDEX idx_brand_id (brand_id),
-    INDEX idx_status (status),
+    -- Covering index for the brand/time-window dashboard aggregates:
+    -- the token, message and user columns ride along so those SUMs and
+    -- counts run as an index-only scan instead of fetching each
+    -- clustered row. The (brand_id, started_at) prefix also serves the
+    -- daily analytics rollup's range seek; predicates must stay
+    -- sargable (no DATE(started_at))
+    INDEX idx_brand_started (brand_id, started_at, total_input_tokens,
+                             total_output_tokens, total_tokens,
+                             message_count, user_id),
+    INDEX idx_brand_date_hour (brand_id, started_date, started_hour),
+    -- Keyset export order (started_at, id): InnoDB appends the PK to
+    -- every secondary index, so this covers the (started_at, id) cursor
+    INDEX idx_started_at (started_at),
+    -- status alone plus the started_at range bound: serves the cleanup
+    -- DELETE (status = 'ended' AND started_at < cutoff) as an index
+    -- range scan; plain status lookups use the prefix
+    INDEX idx_status_started (status, started_at),
     INDEX idx_last_activity (last_activity),
     INDEX idx_email_sent (email_sent)
 ) ENGINE=InnoDB;
@@ -94,9 +135,11 @@ CREATE TABLE messages (
     message_order INT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
-    INDEX idx_session_id (session_id),
+    -- One composite covers the replay/export pattern
+    -- (WHERE session_id = ? ORDER BY message_order) and doubles as the
+    -- FK index via its prefix; message_order is never queried alone
+    INDEX idx_session_order (session_id, message_order),
     INDEX idx_role (role),
-    INDEX idx_message_order (message_order),
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB;
 
@@ -106,13 +149,15 @@ CREATE TABLE email_logs (
     session_id INT NOT NULL,
     user_id INT,
     brand_id INT NOT NULL,
-    recipient_emails TEXT NOT NULL,
+    recipient_emails JSON NOT NULL,
     subject VARCHAR(500),
     status ENUM('pending', 'sent', 'failed') DEFAULT 'pending',
     attempt_count INT DEFAULT 0,
     sent_at TIMESTAMP NULL,
     error_message TEXT,
-    html_content LONGTEXT,
+    -- Blob, not text: HTML bodies are zstd-compressed client-side when
+    -- the zstandard package is installed (plain UTF-8 otherwise)
+    html_content LONGBLOB,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
@@ -183,6 +228,21 @@ CREATE TABLE analytics_summary (
     INDEX idx_date (date)
 ) ENGINE=InnoDB;
 
+-- 9. ANALYTICS_HOURLY_SUMMARY (hour-of-day rollup for cost dashboards)
+CREATE TABLE analytics_hourly_summary (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    brand_id INT,
+    date DATE NOT NULL,
+    hour TINYINT NOT NULL,
+    total_sessions INT DEFAULT 0,
+    total_cost DECIMAL(12, 6) DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (brand_id) REFERENCES brands(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_brand_date_hour (brand_id, date, hour),
+    INDEX idx_date (date)
+) ENGINE=InnoDB;
+
 -- Insert default brands
 INSERT INTO brands (brand_key, brand_display_name, brand_email, vector_store_id, agent_instructions, is_active) VALUES
 ('gbpseo', 'GBPSEO', 'chatbot@gbpseo.in', 'vs_68e895ebfd088191ab82202452458820', 'GBP SEO specialist', TRUE),
@@ -212,4 +272,84 @@ DELIMITER ;
 -- Create event for automatic cleanup (runs every 5 minutes)
 CREATE EVENT IF NOT EXISTS auto_cleanup_sessions
 ON SCHEDULE EVERY 5 MINUTE
-DO CALL cleanup_inactive_sessions();
\ No newline at end of file
+DO CALL cleanup_inactive_sessions();
+
+-- Incremental analytics counters: each event bumps today's
+-- analytics_summary row directly instead of the app re-aggregating the
+-- whole day. Averages and distinct-user counts cannot be maintained as
+-- deltas, so the app's periodic recompute stays on as reconciliation.
+DELIMITER //
+CREATE TRIGGER sessions_analytics_insert AFTER INSERT ON sessions
+FOR EACH ROW
+BEGIN
+    INSERT INTO analytics_summary (brand_id, date, total_sessions)
+    VALUES (NEW.brand_id, CURDATE(), 1)
+    ON DUPLICATE KEY UPDATE total_sessions = total_sessions + 1;
+END //
+
+CREATE TRIGGER sessions_analytics_email AFTER UPDATE ON sessions
+FOR EACH ROW
+BEGIN
+    IF NEW.email_sent = TRUE AND OLD.email_sent = FALSE THEN
+        INSERT INTO analytics_summary (brand_id, date, emails_sent)
+        VALUES (NEW.brand_id, CURDATE(), 1)
+        ON DUPLICATE KEY UPDATE emails_sent = emails_sent + 1;
+    END IF;
+END //
+
+CREATE TRIGGER messages_analytics_insert AFTER INSERT ON messages
+FOR EACH ROW
+BEGIN
+    DECLARE v_brand_id INT;
+    SELECT brand_id INTO v_brand_id FROM sessions WHERE id = NEW.session_id;
+    INSERT INTO analytics_summary (
+        brand_id, date, total_messages,
+        total_input_tokens, total_output_tokens, total_tokens
+    ) VALUES (
+        v_brand_id, CURDATE(), 1,
+        NEW.input_tokens, NEW.output_tokens, NEW.total_tokens
+    )
+    ON DUPLICATE KEY UPDATE
+        total_messages = total_messages + 1,
+        total_input_tokens = total_input_tokens + NEW.input_tokens,
+        total_output_tokens = total_output_tokens + NEW.output_tokens,
+        total_tokens = total_tokens + NEW.total_tokens;
+END //
+DELIMITER ;
+
+-- Collation note for the cost-tracking objects (sessions.model_name and
+-- the models pricing table), which are provisioned by the cost-tracking
+-- rollout rather than this file: both model_name columns must use the
+-- database default collation (utf8mb4_unicode_ci) and models needs an
+-- index on model_name. Mismatched collations force per-row COLLATE
+-- casts in get_cost_by_model and turn the join into a full scan.
+-- On deployments created before this fix, run:
+--   ALTER TABLE sessions MODIFY model_name VARCHAR(128)
+--       CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+--   ALTER TABLE models MODIFY model_name VARCHAR(128)
+--       CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+--   ALTER TABLE models ADD INDEX idx_models_model_name (model_name);
+--
+-- Top-cost session lookups (ORDER BY total_cost DESC LIMIT N) become a
+-- backward index scan instead of a filesort once sessions.total_cost
+-- (also part of the cost-tracking rollout) is indexed:
+--   ALTER TABLE sessions ADD INDEX idx_total_cost (total_cost);
+--   ALTER TABLE sessions ADD INDEX idx_brand_cost (brand_id, total_cost);
+--
+-- On cost-tracking deployments, rebuild idx_brand_started with the cost
+-- columns appended so the cost dashboards also get index-only scans
+-- (verify with EXPLAIN that 'Using index' appears):
+--   ALTER TABLE sessions DROP INDEX idx_brand_started,
+--       ADD INDEX idx_brand_started (brand_id, started_at,
+--           total_cost, input_cost, output_cost, total_input_tokens,
+--           total_output_tokens, total_tokens, message_count, user_id);
+--
+-- Range-partitioning sessions on started_at was considered for the
+-- time-windowed dashboard queries and rejected: MySQL requires every
+-- unique key to include the partition column (the session_id UNIQUE
+-- would have to be dropped or widened) and partitioned InnoDB tables
+-- cannot carry foreign keys, which sessions relies on for user/brand
+-- cleanup. The same pruning effect comes from keeping started_at
+-- predicates sargable (no DATE() wrapping) over idx_brand_started /
+-- idx_started_at, plus serving historical windows from the
+-- analytics_summary rollups instead of the base table.
\ No newline at end of file